@@ -1,14 +1,17 @@
 from __future__ import annotations
 
+import atexit
 import json
 import math
 import os
 import traceback
-from typing import Optional, Dict, Tuple
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Tuple
 import threading
 
 from aqt import gui_hooks, mw
 from .. import ems_logging as LOG
+from ..ems_cache import LRUCache
 from aqt.qt import (
     QWidget,
     QGraphicsPixmapItem,
@@ -217,15 +220,36 @@ def _ensure_state_dir() -> None:
         _log_exc("Failed to create state dir", e)
 
 
-def _read_state() -> dict:
+# State lives in memory after the first read. Changes are written to
+# STATE_PATH atomically, at most once per WRITE_DELAY_S, and flushed on
+# profile close; state_transaction() groups several changes into one.
+WRITE_DELAY_S = 1.0
+
+_STATE_LOCK = threading.RLock()
+_WRITE_LOCK = threading.Lock()
+_state: Optional[dict] = None
+_state_dirty = False
+_write_timer: Optional[threading.Timer] = None
+_txn_depth = 0
+_txn_push = False
+
+
+def _load_state_file() -> dict:
     try:
-        st = {}
         if os.path.exists(STATE_PATH):
             with open(STATE_PATH, "r", encoding="utf-8") as fh:
-                st = json.load(fh) or {}
+                return json.load(fh) or {}
     except Exception as e:
         _log_exc("Failed to read state", e)
-        st = {}
+    return {}
+
+
+def _read_state() -> dict:
+    global _state
+    with _STATE_LOCK:
+        if _state is None:
+            _state = _load_state_file()
+        st = dict(_state)
     # Defaults
     if "xp" not in st:
         st["xp"] = 0
@@ -250,20 +274,71 @@ def _read_state() -> dict:
 
 
 def _write_state(state: dict, push_cloud: bool = True) -> None:
-    try:
-        _ensure_state_dir()
-        with open(STATE_PATH, "w", encoding="utf-8") as fh:
-            json.dump(state, fh, ensure_ascii=False, indent=2)
-    except Exception as e:
-        _log_exc("Failed to write state", e)
-    # Best-effort: push to PocketBase in background if logged in
+    global _state, _state_dirty, _write_timer, _txn_push
+    with _STATE_LOCK:
+        _state = dict(state)
+        _state_dirty = True
+        if _write_timer is None:
+            _write_timer = threading.Timer(WRITE_DELAY_S, flush_state)
+            _write_timer.daemon = True
+            _write_timer.start()
+        if _txn_depth:
+            # Pushed once when the outermost transaction ends
+            _txn_push = _txn_push or push_cloud
+            return
     if push_cloud:
+        _push_cloud(state)
+
+
+def _push_cloud(state: dict) -> None:
+    # Best-effort: push to PocketBase in background if logged in
+    try:
+        # Lazy import to avoid cycles if PB imports this module
+        from .. import ems_pocketbase as PB  # type: ignore
+        PB.tamagotchi_push_async(state)
+    except Exception:
+        pass
+
+
+@contextmanager
+def state_transaction():
+    """Apply several state changes as one: one disk write, at most one cloud push."""
+    global _txn_depth, _txn_push
+    push = False
+    with _STATE_LOCK:
+        _txn_depth += 1
         try:
-            # Lazy import to avoid cycles if PB imports this module
-            from .. import ems_pocketbase as PB  # type: ignore
-            PB.tamagotchi_push_async(state)
-        except Exception:
-            pass
+            yield
+        finally:
+            _txn_depth -= 1
+            if _txn_depth == 0:
+                push, _txn_push = _txn_push, False
+    if push:
+        _push_cloud(_read_state())
+
+
+def flush_state() -> None:
+    """Write pending state changes to STATE_PATH now (atomically)."""
+    global _state_dirty, _write_timer
+    with _WRITE_LOCK:
+        with _STATE_LOCK:
+            if _write_timer is not None:
+                _write_timer.cancel(); _write_timer = None
+            if not _state_dirty or _state is None:
+                return
+            data = json.dumps(_state, ensure_ascii=False, indent=2)
+            _state_dirty = False
+        try:
+            _ensure_state_dir()
+            tmp = STATE_PATH + ".part"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                fh.write(data)
+            os.replace(tmp, STATE_PATH)
+        except Exception as e:
+            _log_exc("Failed to write state", e)
+
+
+atexit.register(flush_state)
 
 
 def _xp_to_stage(xp: int) -> int:
@@ -287,6 +362,160 @@ def _xp_to_stage(xp: int) -> int:
         return 1
 
 
+# ------------------------------ Asset cache ----------------------------------
+
+def _xp_frame_path(stage: int) -> str:
+    return os.path.join(UI_DIR, f"XPBarProgress{stage}_14.png")
+
+
+def _hunger_frame_path(stage: int) -> str:
+    return os.path.join(UI_DIR, f"Hunger{stage}_8.png")
+
+
+def _happiness_frame_path(stage: int) -> str:
+    return os.path.join(UI_DIR, f"Happiness{stage}_8.png")
+
+
+def _cropped(pm: QPixmap) -> Tuple[QPixmap, int, int]:
+    """Crop a full-canvas overlay to its opaque area; returns (pixmap, x, y)."""
+    try:
+        if not pm.isNull() and pm.hasAlphaChannel():
+            from aqt.qt import QRegion
+            r = QRegion(pm.mask()).boundingRect()
+            if r.isValid() and (r.width() < pm.width() or r.height() < pm.height()):
+                return pm.copy(r), r.x(), r.y()
+    except Exception:
+        pass
+    return pm, 0, 0
+
+
+def _tint_image(img, hex_color: str):
+    """Multiply-tint a QImage through its own alpha. Safe off the GUI thread."""
+    from aqt.qt import QImage, QColor, QPainter
+    img = img.convertToFormat(QImage.Format_ARGB32)
+    tint = QImage(img.size(), QImage.Format_ARGB32)
+    tint.fill(QColor(hex_color))
+    # Apply source alpha to tint (mask)
+    p = QPainter(tint)
+    p.setCompositionMode(QPainter.CompositionMode_DestinationIn)
+    p.drawImage(0, 0, img)
+    p.end()
+    # Multiply overlay over original to preserve shading
+    out = QImage(img)
+    p2 = QPainter(out)
+    p2.setCompositionMode(QPainter.CompositionMode_Multiply)
+    p2.drawImage(0, 0, tint)
+    p2.end()
+    return out
+
+
+class _AssetCache:
+    """Decoded Tamagotchi images, so stage changes and animations skip the disk.
+
+    Bar frames (XP, hunger, happiness) are decoded on first use, cropped to
+    their visible area (each is a mostly transparent 1000x1000 overlay, so
+    keeping full canvases would cost ~4 MB apiece) and kept for the session;
+    warm_frames fills in the rest after the window is shown. Character frames,
+    plain or tinted per (path, color), load on first use into LRUs sized to
+    the current life stage's frame set and emptied when the stage changes.
+    Pixmaps are GUI thread only; warm_tints does its QImage work on a thread.
+    """
+
+    def __init__(self, stage_frames: int = len(EMOTIONS)):
+        self._frames: Dict[str, Tuple[QPixmap, int, int]] = {}
+        self._characters = LRUCache(stage_frames)
+        self._tinted = LRUCache(stage_frames)       # (path, color) -> QPixmap
+        self._tint_images = LRUCache(stage_frames)  # (path, color) -> QImage from warm_tints
+        # Bumped on every stage change and warm-up; results of older warm jobs are dropped
+        self._gen = 0
+        self._gen_lock = threading.Lock()
+
+    def frame(self, path: str) -> Tuple[QPixmap, int, int]:
+        hit = self._frames.get(path)
+        if hit is None:
+            hit = self._frames[path] = _cropped(QPixmap(path))
+        return hit
+
+    def warm_frames(self) -> None:
+        """Decode the remaining bar frames one per event-loop pass, off the window-open path."""
+        todo = [_xp_frame_path(n) for n in range(1, 15)]
+        for n in range(9):
+            todo += [_hunger_frame_path(n), _happiness_frame_path(n)]
+        todo = [p for p in todo if p not in self._frames]
+        def _next():
+            while todo:
+                p = todo.pop(0)
+                if p not in self._frames:
+                    try:
+                        self.frame(p)
+                    except Exception as e:
+                        _log_exc("frame warm-up", e)
+                    break
+            if todo:
+                QTimer.singleShot(0, _next)
+        if todo:
+            QTimer.singleShot(0, _next)
+
+    def character(self, path: str) -> QPixmap:
+        pm = self._characters.get(path)
+        if pm is None:
+            pm = QPixmap(path)
+            self._characters.put(path, pm)
+        return pm
+
+    def tinted(self, path: str, color: str) -> QPixmap:
+        key = (path, color.lower())
+        pm = self._tinted.get(key)
+        if pm is None:
+            img = self._tint_images.pop(key)
+            if img is None:
+                img = _tint_image(self.character(path).toImage(), color)
+            pm = QPixmap.fromImage(img)
+            self._tinted.put(key, pm)
+        return pm
+
+    def warm_tints(self, paths, color: str) -> None:
+        """Tint `paths` in the background so later swaps are a pixmap assignment."""
+        if not color:
+            return
+        ckey = color.lower()
+        todo = [p for p in dict.fromkeys(paths) if (p, ckey) not in self._tinted and (p, ckey) not in self._tint_images]
+        if not todo:
+            return
+        with self._gen_lock:
+            self._gen += 1
+            gen = self._gen
+        def _run():
+            from aqt.qt import QImage
+            for p in todo:
+                try:
+                    img = _tint_image(QImage(p), color)
+                    with self._gen_lock:
+                        if gen != self._gen:
+                            return  # stage changed or a newer warm-up took over
+                        self._tint_images.put((p, ckey), img)
+                except Exception as e:
+                    _log_exc("tint warm-up", e)
+        threading.Thread(target=_run, daemon=True, name="ems-tama-tint").start()
+
+    def drop_characters(self, stage_frames: int) -> None:
+        """Forget the previous stage's frames and size the LRUs for the new stage."""
+        with self._gen_lock:
+            self._gen += 1
+            for cache in (self._characters, self._tinted, self._tint_images):
+                cache.clear()
+                cache.maxsize = max(1, int(stage_frames))
+
+
+_ASSETS = _AssetCache()
+
+
+def _set_frame(item, frame: Tuple[QPixmap, int, int]) -> None:
+    pm, x, y = frame
+    item.setPixmap(pm)
+    item.setOffset(x, y)
+
+
 class LeoTamagotchiWindow(QWidget):
     """Layered scene: CleanUI (base) -> progress bars -> DefaultLeo (top)."""
 
@@ -346,6 +575,7 @@ class LeoTamagotchiWindow(QWidget):
         self._idle_sleeping: bool = False
 
         self._init_layers()
+        self._warm_tints()
         # Initial XP/hunger/happiness load
         st = _read_state()
         self.update_xp(st.get("xp", 0), animate=False)
@@ -646,9 +876,8 @@ class LeoTamagotchiWindow(QWidget):
             stage = max(1, min(14, int(stage)))
             if self._current_stage != stage:
                 self._current_stage = stage
-            xp_path = os.path.join(UI_DIR, f"XPBarProgress{stage}_14.png")
             if self.xp_item is not None:
-                self.xp_item.setPixmap(QPixmap(xp_path))
+                _set_frame(self.xp_item, _ASSETS.frame(_xp_frame_path(stage)))
         except Exception as e:
             _log_exc("Failed to set XP stage", e)
 
@@ -657,8 +886,7 @@ class LeoTamagotchiWindow(QWidget):
             stage = max(0, min(8, int(stage)))
             self._hunger_stage = stage
             if self.hunger_item is not None:
-                hunger_path = os.path.join(UI_DIR, f"Hunger{stage}_8.png")
-                self.hunger_item.setPixmap(QPixmap(hunger_path))
+                _set_frame(self.hunger_item, _ASSETS.frame(_hunger_frame_path(stage)))
             self.refresh_baseline_character()
         except Exception as e:
             _log_exc("Failed to set hunger stage", e)
@@ -668,8 +896,7 @@ class LeoTamagotchiWindow(QWidget):
             stage = max(0, min(8, int(stage)))
             self._happiness_stage = stage
             if self.happiness_item is not None:
-                path = os.path.join(UI_DIR, f"Happiness{stage}_8.png")
-                self.happiness_item.setPixmap(QPixmap(path))
+                _set_frame(self.happiness_item, _ASSETS.frame(_happiness_frame_path(stage)))
             self.refresh_baseline_character()
         except Exception as e:
             _log_exc("Failed to set happiness stage", e)
@@ -875,11 +1102,11 @@ class LeoTamagotchiWindow(QWidget):
         try:
             self._current_char = name
             path = self._character_path(name)
-            pm = QPixmap(path)
+            pm = _ASSETS.character(path)
             # Apply tint for PNGs only (to avoid coloring JPEG backgrounds)
             try:
                 if self._leo_color and path.lower().endswith(".png"):
-                    pm = self._tint_pixmap(pm, self._leo_color)
+                    pm = _ASSETS.tinted(path, self._leo_color)
             except Exception:
                 pass
             if self.leo_item is not None:
@@ -891,27 +1118,18 @@ class LeoTamagotchiWindow(QWidget):
         except Exception as e:
             _log_exc("Failed to apply character", e)
 
-    def _tint_pixmap(self, pm: QPixmap, hex_color: str) -> QPixmap:
+    def _stage_frame_paths(self) -> List[str]:
+        return sorted({self._asset_for_stage_emotion(self._life_stage, e) for e in EMOTIONS})
+
+    def _warm_tints(self) -> None:
+        """Pre-tint this life stage's PNG frames for the current color."""
         try:
-            from aqt.qt import QImage, QColor, QPainter
-            img = pm.toImage().convertToFormat(QImage.Format_ARGB32)
-            tint = QImage(img.size(), QImage.Format_ARGB32)
-            c = QColor(hex_color)
-            tint.fill(c)
-            # Apply source alpha to tint (mask)
-            p = QPainter(tint)
-            p.setCompositionMode(QPainter.CompositionMode_DestinationIn)
-            p.drawImage(0, 0, img)
-            p.end()
-            # Multiply overlay over original to preserve shading
-            out = QImage(img)
-            p2 = QPainter(out)
-            p2.setCompositionMode(QPainter.CompositionMode_Multiply)
-            p2.drawImage(0, 0, tint)
-            p2.end()
-            return QPixmap.fromImage(out)
-        except Exception:
-            return pm
+            if not self._leo_color:
+                return
+            paths = self._stage_frame_paths()
+            _ASSETS.warm_tints([p for p in paths if p.lower().endswith(".png") and os.path.exists(p)], self._leo_color)
+        except Exception as e:
+            _log_exc("tint warm-up failed", e)
 
     def _compute_baseline(self) -> str:
         try:
@@ -1075,6 +1293,9 @@ class LeoTamagotchiWindow(QWidget):
                 return
             if self._life_stage != stage:
                 self._life_stage = stage
+                # Character frames are per stage; the old stage's are not needed again soon
+                _ASSETS.drop_characters(len(self._stage_frame_paths()))
+                self._warm_tints()
                 try:
                     LOG.log("tama.stage.set", stage=stage)
                 except Exception:
@@ -1092,6 +1313,7 @@ class LeoTamagotchiWindow(QWidget):
                 LOG.log("tama.color.set" if color else "tama.color.reset", color=color)
             except Exception:
                 pass
+            self._warm_tints()
             # Re-apply current character with tint
             self.refresh_baseline_character()
         except Exception as e:
@@ -1117,6 +1339,8 @@ def show_tamagotchi() -> None:
         _window_singleton.show()
         _window_singleton.raise_()
         _window_singleton.activateWindow()
+        # Remaining bar frames decode once the window has painted, so animations never wait on disk
+        QTimer.singleShot(500, _ASSETS.warm_frames)
         # Background: attempt to pull newer cloud state and apply
         def _pull_apply():
             try:
@@ -1261,9 +1485,9 @@ def sync_now() -> None:
                 QTimer.singleShot(0, _need_login)
                 return
 
-            # Push local
-            local = _read_state()
-            ok_push, msg_push, rid = PB.tamagotchi_upsert(local)
+            # Push local through the background worker so it cannot race a queued push
+            PB.tamagotchi_push_async(_read_state())
+            ok_push, msg_push = PB.tamagotchi_push_now(wait_s=20.0)
 
             # Fetch remote newest
             ok_fetch, remote, rts, _rid, msg_fetch = PB.tamagotchi_fetch()
@@ -1452,39 +1676,41 @@ def _on_card_answered(*args, **kwargs) -> None:
                 ease = args[-1]
         if ease is None:
             return
-        # XP only for correct answers
         e = int(ease)
-        if e > 1:  # 1=Again (incorrect); >1 considered correct
-            add_xp(2)
-        # Hunger drops by one on every answered card (any ease)
-        decrease_hunger(1)
-        # Happiness logic: 0..8 range
-        if e <= 1:
-            change_happiness(-1)
-        elif e == 4:
-            change_happiness(+2)
-        else:
-            change_happiness(+1)
-
-        # Track streaks for character reactions
-        st = _read_state()
-        if e == 1:
-            st["again_streak"] = int(st.get("again_streak", 0)) + 1
-            st["easy_streak"] = 0
-            _write_state(st)
-            show_temp_character("angry", seconds=10)
-            if st["again_streak"] >= 3:
-                show_temp_character("angry", seconds=10)
-        else:
-            st["again_streak"] = 0
-            if e == 4:
-                st["easy_streak"] = int(st.get("easy_streak", 0)) + 1
-                _write_state(st)
-                if st["easy_streak"] >= 3:
-                    show_temp_character("happy", seconds=10)
+        # All per-answer changes land in one state write and one cloud push
+        with state_transaction():
+            # XP only for correct answers
+            if e > 1:  # 1=Again (incorrect); >1 considered correct
+                add_xp(2)
+            # Hunger drops by one on every answered card (any ease)
+            decrease_hunger(1)
+            # Happiness logic: 0..8 range
+            if e <= 1:
+                change_happiness(-1)
+            elif e == 4:
+                change_happiness(+2)
             else:
+                change_happiness(+1)
+
+            # Track streaks for character reactions
+            st = _read_state()
+            if e == 1:
+                st["again_streak"] = int(st.get("again_streak", 0)) + 1
                 st["easy_streak"] = 0
                 _write_state(st)
+                show_temp_character("angry", seconds=10)
+                if st["again_streak"] >= 3:
+                    show_temp_character("angry", seconds=10)
+            else:
+                st["again_streak"] = 0
+                if e == 4:
+                    st["easy_streak"] = int(st.get("easy_streak", 0)) + 1
+                    _write_state(st)
+                    if st["easy_streak"] >= 3:
+                        show_temp_character("happy", seconds=10)
+                else:
+                    st["easy_streak"] = 0
+                    _write_state(st)
     except Exception as e:
         _log_exc("Error handling reviewer_did_answer_card", e)
 
@@ -1497,6 +1723,10 @@ def setup_hooks() -> None:
     try:
         if not _hooks_registered:
             gui_hooks.reviewer_did_answer_card.append(_on_card_answered)
+            try:
+                gui_hooks.profile_will_close.append(flush_state)
+            except Exception:
+                pass
             try:
                 gui_hooks.reviewer_did_show_question.append(_on_card_answered_show_question)
             except Exception:
@@ -1,12 +1,19 @@
 ﻿
 from __future__ import annotations
 import json, os, re, time, urllib.request, urllib.error, threading, shutil, html, uuid, hashlib
-import urllib.parse
+import urllib.parse, random, pickle
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from collections.abc import Mapping
 from typing import Any, Dict, List, Tuple
 from aqt import mw, gui_hooks
 from aqt.qt import QAction, qconnect, QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QSpinBox, QCheckBox, QLineEdit, QIcon, QPlainTextEdit, QScrollArea, QWidget, QTabWidget, QFileDialog, QMessageBox, QFrame, QColorDialog, QPixmap, Qt
 from aqt.webview import AnkiWebView
 from . import ems_logging as LOG
+from .ems_matching import SurfaceAutomaton, FuzzyIndex
+from . import ems_http as HTTP
+from .ems_cache import LRUCache
+from .ems_sanitize import sanitize_html
 from aqt.utils import openFolder, showInfo, showText, tooltip, openLink
 from anki.notes import Note
 
@@ -28,12 +35,27 @@ FETCHED_INDEX_PARSED = os.path.join(STATE_DIR, "fetched_index_parsed.json")
 SUGGEST_DRAFT_PATH = os.path.join(STATE_DIR, "suggest_draft.json")
 LOGO_PATH = os.path.join(WEB_DIR, "ems_logo.png")
 THEME_JSON_PATH = os.path.join(STATE_DIR, "theme.json")
+HTTP_VALIDATORS_PATH = os.path.join(STATE_DIR, "http_validators.json")
+INDEX_CACHE_PATH = os.path.join(STATE_DIR, "glossary_index.pickle")
+INDEX_CACHE_FORMAT = 3  # bump when the cached layout or the build rules change
+TERM_BODY_CACHE_SIZE = 256  # full term JSON bodies kept in memory (LRU)
+POPUP_HTML_CACHE_SIZE = 256  # rendered popup HTML, keyed by (term id, file sha1)
+MATCH_CACHE_PATH = os.path.join(STATE_DIR, "match_cache.json")
+MATCH_PAYLOAD_VERSION = 3  # card payload carries matched surfaces, not patterns
+HTML_PACK_PATH = os.path.join(USER_FILES_DIR, "terms_html.pack")
+HTML_PACK_FORMAT = 2  # bump when popup rendering changes
 
 RAW_INDEX = "https://raw.githubusercontent.com/EnterMedSchool/Anki/main/glossary/index.json"
 RAW_TERMS_BASE = "https://raw.githubusercontent.com/EnterMedSchool/Anki/main/glossary/terms"
+RAW_TAGS = "https://raw.githubusercontent.com/EnterMedSchool/Anki/main/glossary/tags.json"
 
 AUTO_UPDATE_DAYS = 1
 
+# Term downloads: parallel workers, attempts per file, and a budget for the whole batch
+FETCH_WORKERS = 8
+FETCH_ATTEMPTS = 3
+FETCH_DEADLINE_S = 180
+
 DEFAULT_CONFIG = {
     "tooltip_width_px": 640,
     "popup_font_px": 16,
@@ -49,6 +71,10 @@ DEFAULT_CONFIG = {
     "fuzzy_max_add": 6,
     "ship_index_if_no_matches": True,
     "ship_index_limit": 3000,
+    "prefetch_ratings": True,              # fetch rating summaries for a card's terms while it shows
+    "match_engine": "automaton",           # "automaton" (Aho-Corasick) or "regex" (legacy alternation)
+    "match_cache_size": 2000,              # note texts whose matches are remembered (LRU)
+    "match_cache_persist": True,           # keep that cache in _state across sessions
 
     # Learn cards
     "learn_target": "dedicated",           # "dedicated" or "current"
@@ -267,7 +293,28 @@ try:
 except Exception as e:
     _log(f"Hook Tamagotchi auto-open failed: {e}")
 
+# In-memory copy of the merged config (add-on config + defaults + theme.json).
+# get_config() is called on hot paths (card render, every log line), so the disk
+# read/merge happens once; write_config() and the add-on manager hook drop it.
+_CONFIG_CACHE: Dict[str, Any] | None = None
+_CONFIG_LOCK = threading.RLock()
+
+def invalidate_config(*_args) -> None:
+    global _CONFIG_CACHE
+    with _CONFIG_LOCK:
+        _CONFIG_CACHE = None
+
 def get_config() -> Dict[str, Any]:
+    global _CONFIG_CACHE
+    cached = _CONFIG_CACHE
+    if cached is not None:
+        return dict(cached)
+    with _CONFIG_LOCK:
+        if _CONFIG_CACHE is None:
+            _CONFIG_CACHE = _load_config()
+        return dict(_CONFIG_CACHE)
+
+def _load_config() -> Dict[str, Any]:
     try:
         cfg = mw.addonManager.getConfig(MODULE) or {}
     except Exception as e:
@@ -324,6 +371,13 @@ def write_config(cfg: Dict[str, Any]) -> None:
             json.dump(out, fh, ensure_ascii=False, indent=2)
     except Exception as e:
         _log(f"write theme overrides failed: {e}")
+    invalidate_config()
+
+# Edits made through Tools > Add-ons > Config bypass write_config()
+try:
+    mw.addonManager.setConfigUpdatedAction(MODULE, invalidate_config)
+except Exception as e:
+    _log(f"setConfigUpdatedAction failed: {e}")
 
 def _sha1(s: str) -> str:
     return hashlib.sha1(s.encode("utf-8")).hexdigest()
@@ -341,6 +395,44 @@ def _http_text(url: str, timeout: int = 25, bust: bool = False, token: str = "")
     with urllib.request.urlopen(req, timeout=timeout) as resp:
         return resp.read().decode("utf-8", errors="replace")
 
+def _load_validators() -> Dict[str, Dict[str, str]]:
+    try:
+        if os.path.exists(HTTP_VALIDATORS_PATH):
+            return json.load(open(HTTP_VALIDATORS_PATH, "r", encoding="utf-8")) or {}
+    except Exception:
+        pass
+    return {}
+
+def _save_validators(url: str, validators: Dict[str, str] | None) -> None:
+    try:
+        allv = _load_validators()
+        if validators: allv[url] = validators
+        else: allv.pop(url, None)
+        with open(HTTP_VALIDATORS_PATH, "w", encoding="utf-8") as fh:
+            json.dump(allv, fh, ensure_ascii=False, indent=2)
+    except Exception as e:
+        _log(f"save validators failed: {e}")
+
+def _http_text_conditional(url: str, timeout: int = 25, bust: bool = False, token: str = "", validators: Dict[str, str] | None = None):
+    """GET with If-None-Match / If-Modified-Since from `validators`.
+    Returns (status, text, validators) where status is 200 or 304."""
+    final = _cache_bust(url, token) if bust else url
+    headers = {"User-Agent": "EMSGlossary/2.0 (+anki)"}
+    if bust:
+        headers["Cache-Control"] = "no-cache"; headers["Pragma"] = "no-cache"
+    v = validators or {}
+    if v.get("etag"): headers["If-None-Match"] = v["etag"]
+    if v.get("last_modified"): headers["If-Modified-Since"] = v["last_modified"]
+    r = HTTP.request("GET", final, headers=headers, timeout=timeout)
+    if r.status == 304:
+        return 304, "", v
+    if r.status != 200:
+        raise HTTP.HTTPStatusError(r.status, url)
+    newv = {}
+    if r.headers.get("etag"): newv["etag"] = r.headers["etag"]
+    if r.headers.get("last-modified"): newv["last_modified"] = r.headers["last-modified"]
+    return 200, r.text(), newv
+
 def _json_relaxed(text: str) -> Dict[str, Any]:
     s = text.lstrip("\ufeff").strip()
     s = re.sub(r"/\*.*?\*/", "", s, flags=re.S)
@@ -349,7 +441,9 @@ def _json_relaxed(text: str) -> Dict[str, Any]:
     return json.loads(s)
 
 def _http_json(url: str, timeout: int = 25, bust: bool = False, token: str = "") -> Dict[str, Any]:
-    raw = _http_text(url, timeout=timeout, bust=bust, token=token)
+    return _parse_fetched_json(_http_text(url, timeout=timeout, bust=bust, token=token), url)
+
+def _parse_fetched_json(raw: str, url: str) -> Dict[str, Any]:
     try:
         data = json.loads(raw)
     except Exception:
@@ -365,49 +459,133 @@ def _http_json(url: str, timeout: int = 25, bust: bool = False, token: str = "")
         pass
     return data
 
+# Fields of a term kept resident in the index; everything else is read from
+# disk on demand through GlossaryStore.term().
+TERM_META_KEYS = ("names", "tags", "primary_tag")
+
+class GlossaryIndex:
+    """One compiled generation of the glossary (term metadata, surfaces, tag
+    palette and matcher). GlossaryStore.reload() builds a new one to the side
+    and publishes it with a single reference swap; a published index is never
+    mutated, so readers on the main thread can hold one without locking."""
+
+    __slots__ = ("generation", "fingerprint", "file_hashes", "term_meta", "patterns_by_id", "tags_meta", "surface_claims",
+                 "fuzzy", "big_regex", "automaton")
+
+    def __init__(self, generation: int = 0, term_meta=None, patterns_by_id=None, tags_meta=None,
+                 surface_claims=None, fuzzy=None, big_regex=None, automaton=None, fingerprint: str = "",
+                 file_hashes=None):
+        self.generation = generation
+        self.fingerprint = fingerprint  # content hash of the inputs; stable across sessions
+        self.file_hashes = MappingProxyType(file_hashes or {})  # term file name -> sha1 of its bytes
+        self.term_meta = MappingProxyType(term_meta or {})  # id -> {id, file, names, tags, primary_tag}
+        self.patterns_by_id = MappingProxyType(patterns_by_id or {})
+        self.tags_meta = MappingProxyType(tags_meta or {})
+        self.surface_claims = MappingProxyType(surface_claims or {})
+        self.fuzzy: FuzzyIndex | None = fuzzy  # single-word surfaces with one claimant
+        self.big_regex = big_regex
+        self.automaton: SurfaceAutomaton | None = automaton
+
+    def has_matcher(self) -> bool:
+        return self.automaton is not None or self.big_regex is not None
+
+    def content_key(self, tid: str) -> str:
+        """Identifies the current content of one term; changes only when its file does."""
+        meta = self.term_meta.get(tid) or {}
+        return self.file_hashes.get(meta.get("file") or "") or f"g{self.generation}"
+
+class _LazyTerms(Mapping):
+    """Read-only id -> full term mapping over one index generation. Bodies are
+    loaded through the store's LRU, so only the ids are held here."""
+
+    def __init__(self, store: "GlossaryStore", idx: GlossaryIndex):
+        self._store = store; self._idx = idx
+
+    def __getitem__(self, tid: str) -> Dict[str, Any]:
+        t = self._store._term_body(self._idx, tid)
+        if t is None: raise KeyError(tid)
+        return t
+
+    def __contains__(self, tid) -> bool:
+        return tid in self._idx.term_meta
+
+    def __iter__(self):
+        return iter(self._idx.term_meta)
+
+    def __len__(self) -> int:
+        return len(self._idx.term_meta)
+
 class GlossaryStore:
     def __init__(self, terms_dir: str):
         self.terms_dir = terms_dir
-        self.terms_by_id: Dict[str, Dict[str, Any]] = {}
-        self.patterns_by_id: Dict[str, List[str]] = {}
-        self.tags_meta: Dict[str, Dict[str, str]] = {}
-        self.surface_claims: Dict[str, List[str]] = {}
-        self.single_word_surfaces: Dict[int, List[str]] = {}
-        self.card_cache: Dict[int, Dict[str, Any]] = {}
+        self._bodies = LRUCache(TERM_BODY_CACHE_SIZE)
+        # (term id, content key) -> (title, sanitized popup html); see rendered_popup()
+        self._html = LRUCache(POPUP_HTML_CACHE_SIZE)
+        self._pack = None  # prerendered popups: (entries, body offset, file id), loaded on first use
+        # (index fingerprint, note text hash) -> (found_ids, claims_on_card)
+        self.match_cache = LRUCache(int(get_config().get("match_cache_size", 2000) or 2000))
+        self._match_cache_dirty = False
+        self._index = GlossaryIndex()
+        self._reload_lock = threading.Lock()
         os.makedirs(self.terms_dir, exist_ok=True)
         os.makedirs(STATE_DIR, exist_ok=True)
-        self._load_tags_palette()
         self.reload()
+        self.load_match_cache()
+
+    # Views of the current generation. Code that reads several of these
+    # together should take `self.index` once and use that instead.
+    @property
+    def index(self) -> GlossaryIndex: return self._index
+    @property
+    def terms_by_id(self): return _LazyTerms(self, self._index)
+    @property
+    def term_meta(self): return self._index.term_meta
+    @property
+    def patterns_by_id(self): return self._index.patterns_by_id
+    @property
+    def tags_meta(self): return self._index.tags_meta
+    @property
+    def surface_claims(self): return self._index.surface_claims
+    @property
+    def big_regex(self): return self._index.big_regex
+    @property
+    def automaton(self): return self._index.automaton
+
+    def term(self, tid: str) -> Dict[str, Any] | None:
+        """Full JSON body of a term (popup, learn cards), loaded on demand."""
+        return self._term_body(self._index, tid)
+
+    def _term_body(self, idx: GlossaryIndex, tid: str) -> Dict[str, Any] | None:
+        meta = idx.term_meta.get(tid)
+        if not meta: return None
+        key = (idx.generation, tid)
+        t = self._bodies.get(key)
+        if t is None:
+            try:
+                t = json.load(open(os.path.join(self.terms_dir, meta["file"]), "r", encoding="utf-8"))
+            except Exception as e:
+                _log(f"load term body {tid} failed: {e}"); return None
+            t["id"] = tid
+            self._bodies.put(key, t)
+        return t
 
-    def _load_tags_palette(self):
-        self.tags_meta = {}
+    def _load_tags_palette(self) -> Dict[str, Dict[str, str]]:
+        tags_meta: Dict[str, Dict[str, str]] = {}
         try:
             if os.path.exists(TAGS_JSON_PATH):
                 raw = open(TAGS_JSON_PATH, "r", encoding="utf-8").read()
                 data = _json_relaxed(raw)
                 for k, v in (data or {}).items():
                     if isinstance(v, str):
-                        self.tags_meta[k] = {"accent": v, "icon": ""}
+                        tags_meta[k] = {"accent": v, "icon": ""}
                     elif isinstance(v, dict):
-                        self.tags_meta[k] = {"accent": v.get("accent", ""), "icon": v.get("icon", "")}
+                        tags_meta[k] = {"accent": v.get("accent", ""), "icon": v.get("icon", "")}
         except Exception as e:
             _log(f"load tags palette failed: {e}")
-
-    _on_attr_rx  = re.compile(r'\son[a-zA-Z]+\s*=\s*"[^"]*"', re.IGNORECASE)
-    _on_attr_rx2 = re.compile(r"\son[a-zA-Z]+\s*=\s*'[^']*'", re.IGNORECASE)
-    _js_href_rx  = re.compile(r'href\s*=\s*"(?:\s*javascript:.*?)"', re.IGNORECASE)
-    _js_href_rx2 = re.compile(r"href\s*=\s*'(?:\s*javascript:.*?)'", re.IGNORECASE)
-    _script_block_rx = re.compile(r"(?is)<\s*script[^>]*>.*?<\s*/\s*script\s*>", re.S)
+        return tags_meta
 
     def _sanitize_html(self, value: str) -> str:
-        s = value or ""
-        s = self._script_block_rx.sub("", s)
-        s = self._on_attr_rx.sub("", s)
-        s = self._on_attr_rx2.sub("", s)
-        s = self._js_href_rx.sub('href="#"', s)
-        s = self._js_href_rx2.sub("href='#'", s)
-        s = re.sub(r"\[\[([a-z0-9\-]+)\]\]", r"<a href='#' data-ems-link='\1'>\1</a>", s, flags=re.IGNORECASE)
-        return s
+        return sanitize_html(value)
 
     def _variants_for(self, surface: str) -> List[str]:
         out = set([surface]); s = surface
@@ -426,69 +604,213 @@ class GlossaryStore:
         return [x for x in out if x]
 
     def reload(self):
+        """Rebuild the glossary from disk and publish it as the next generation.
+        Safe to call from a worker thread: the current index stays live until
+        the new one is complete, and a failed build keeps the old one."""
+        with self._reload_lock:
+            try:
+                idx = self._build_index(self._index.generation + 1)
+            except Exception as e:
+                _log(f"reload failed: {e}"); return
+            self._index = idx
+            self.match_cache.clear()
+            self._bodies.clear()
+            self._prune_rendered(idx)
+
+    def _prune_rendered(self, idx: GlossaryIndex) -> None:
+        """Drop rendered popups whose term file changed or vanished, then re-render
+        those (recently opened) terms in the background so the next open is a hit."""
+        stale = []
+        for key, _v in self._html.items():
+            tid, ck = key
+            if tid not in idx.term_meta or idx.content_key(tid) != ck:
+                self._html.pop(key)
+                if tid in idx.term_meta: stale.append(tid)
+        if not stale: return
+        def warm():
+            for tid in stale:
+                if self._index is not idx: return  # superseded by a newer reload
+                try: self.rendered_popup(tid)
+                except Exception: pass
+        threading.Thread(target=warm, name="ems-popup-warm", daemon=True).start()
+
+    def load_match_cache(self) -> None:
+        """Seed match_cache from MATCH_CACHE_PATH if it was written for the current index."""
         try:
-            self.terms_by_id.clear(); self.patterns_by_id.clear()
-            self.surface_claims.clear(); self.single_word_surfaces.clear()
-            mutes = set(x.strip().lower() for x in (get_config().get("mute_tags", "") or "").split(",") if x.strip())
-            for name in sorted(os.listdir(self.terms_dir)):
-                if not name.lower().endswith(".json"): continue
-                p = os.path.join(self.terms_dir, name)
-                try:
-                    term = json.load(open(p, "r", encoding="utf-8"))
-                except Exception as e:
-                    _log(f"load term {name} failed: {e}"); continue
-                tid = term.get("id") or os.path.splitext(name)[0]
-                term["id"] = tid
-                self.terms_by_id[tid] = term
-
-                patterns = []
-                def add_many(values):
-                    nonlocal patterns
-                    if not values: return
-                    if isinstance(values, str): values = [values]
-                    for v in values:
-                        v = (v or "").strip()
-                        if v: patterns.append(v)
-                add_many(term.get("names"))
-                add_many(term.get("aliases"))
-                add_many(term.get("abbr"))
-                add_many(term.get("patterns"))
-                if not patterns and term.get("names"):
-                    patterns = term["names"]
-
-                expanded = []
-                for ptn in patterns:
-                    expanded.append(ptn)
-                    if " " not in ptn:
-                        expanded.extend(self._variants_for(ptn))
-
-                uniq, seen = [], set()
-                for ptn in expanded:
-                    k = (ptn or "").lower()
-                    if not k or k in seen: continue
-                    seen.add(k); uniq.append(ptn)
-                    if not any((t or "").lower() in mutes for t in (term.get("tags") or [])):
-                        self.surface_claims.setdefault(k, []).append(tid)
-                        if " " not in k and "-" not in k and "/" not in k:
-                            self.single_word_surfaces.setdefault(len(k), []).append(k)
-                self.patterns_by_id[tid] = uniq
-
-            if self.surface_claims:
-                alts = sorted(self.surface_claims.keys(), key=len, reverse=True)
-                def esc(s: str):
-                    import re as _re
-                    return _re.escape(s).replace(r"\ ", " ").replace(r"\'", "'").replace(r"\-", "-").replace(r"\/", "/")
-                joined = "|".join(esc(a) for a in alts)
-                try:
-                    self.big_regex = re.compile(r"(?<![A-Za-z0-9])(?:" + joined + r")(?![A-Za-z0-9])", re.IGNORECASE)
-                except Exception as e:
-                    _log(f"regex compile failed: {e}"); self.big_regex = None
-            else:
-                self.big_regex = None
+            if not get_config().get("match_cache_persist", True) or not os.path.exists(MATCH_CACHE_PATH): return
+            data = json.load(open(MATCH_CACHE_PATH, "r", encoding="utf-8")) or {}
+            fp = self._index.fingerprint
+            if not fp or data.get("fingerprint") != fp: return
+            for h, ids, claims in data.get("entries") or []:
+                self.match_cache.put((fp, h), (ids, claims))
+        except Exception as e:
+            _log(f"match cache load failed: {e}")
+
+    def save_match_cache(self) -> None:
+        if not self._match_cache_dirty: return
+        try:
+            if not get_config().get("match_cache_persist", True): return
+            fp = self._index.fingerprint
+            entries = [[k[1], v[0], v[1]] for k, v in self.match_cache.items() if k[0] == fp]
+            tmp_path = MATCH_CACHE_PATH + ".part"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump({"fingerprint": fp, "entries": entries}, fh, ensure_ascii=False)
+            os.replace(tmp_path, MATCH_CACHE_PATH)
+            self._match_cache_dirty = False
+        except Exception as e:
+            _log(f"match cache save failed: {e}")
+
+    def _term_file_hashes(self) -> Dict[str, str]:
+        """sha1 of every term file, by file name ("" if unreadable)."""
+        out: Dict[str, str] = {}
+        for name in sorted(os.listdir(self.terms_dir)):
+            if not name.lower().endswith(".json"): continue
+            try:
+                with open(os.path.join(self.terms_dir, name), "rb") as fh: out[name] = hashlib.sha1(fh.read()).hexdigest()
+            except Exception:
+                out[name] = ""
+        return out
+
+    def _index_cache_key(self, mutes, engine: str, file_hashes: Dict[str, str]) -> str:
+        """Fingerprint of every input of _build_index: term file contents, tags.json,
+        mute_tags and the match engine."""
+        h = hashlib.sha1()
+        h.update(f"v{INDEX_CACHE_FORMAT}\0{','.join(sorted(mutes))}\0{engine}\0".encode("utf-8"))
+        try:
+            with open(TAGS_JSON_PATH, "rb") as fh: h.update(hashlib.sha1(fh.read()).digest())
+        except Exception:
+            h.update(b"-")
+        for name in sorted(file_hashes):
+            h.update(name.encode("utf-8") + b"\0")
+            h.update(bytes.fromhex(file_hashes[name]) if file_hashes[name] else b"-")
+        return h.hexdigest()
 
-            self.card_cache.clear()
+    def _load_index_cache(self, key: str, generation: int, file_hashes: Dict[str, str]) -> GlossaryIndex | None:
+        try:
+            if not os.path.exists(INDEX_CACHE_PATH): return None
+            with open(INDEX_CACHE_PATH, "rb") as fh: data = pickle.load(fh)
+            if not isinstance(data, dict) or data.get("key") != key: return None
+            return GlossaryIndex(generation, data["term_meta"], data["patterns_by_id"], data["tags_meta"],
+                                 data["surface_claims"], data.get("fuzzy"), data.get("big_regex"), data.get("automaton"),
+                                 fingerprint=key, file_hashes=file_hashes)
+        except Exception as e:
+            _log(f"index cache load failed: {e}")
+            return None
+
+    def _save_index_cache(self, key: str, data: Dict[str, Any]) -> None:
+        try:
+            os.makedirs(STATE_DIR, exist_ok=True)
+            tmp_path = INDEX_CACHE_PATH + ".part"
+            with open(tmp_path, "wb") as fh: pickle.dump(dict(data, key=key), fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, INDEX_CACHE_PATH)
         except Exception as e:
-            _log(f"reload failed: {e}")
+            _log(f"index cache save failed: {e}")
+
+    def _build_index(self, generation: int) -> GlossaryIndex:
+        t0 = time.time()
+        cfg = get_config()
+        mutes = set(x.strip().lower() for x in (cfg.get("mute_tags", "") or "").split(",") if x.strip())
+        engine = str(cfg.get("match_engine", "automaton") or "automaton").lower()
+        file_hashes = self._term_file_hashes()
+        key = self._index_cache_key(mutes, engine, file_hashes)
+        cached = self._load_index_cache(key, generation, file_hashes)
+        if cached is not None:
+            try:
+                LOG.log("glossary.index.load", source="cache", terms=len(cached.term_meta), ms=round((time.time() - t0) * 1000, 1))
+            except Exception:
+                pass
+            return cached
+
+        term_meta: Dict[str, Dict[str, Any]] = {}
+        patterns_by_id: Dict[str, List[str]] = {}
+        surface_claims: Dict[str, List[str]] = {}
+        single_word_surfaces: Dict[int, List[str]] = {}
+        tags_meta = self._load_tags_palette()
+        for name in sorted(os.listdir(self.terms_dir)):
+            if not name.lower().endswith(".json"): continue
+            p = os.path.join(self.terms_dir, name)
+            try:
+                term = json.load(open(p, "r", encoding="utf-8"))
+            except Exception as e:
+                _log(f"load term {name} failed: {e}"); continue
+            tid = term.get("id") or os.path.splitext(name)[0]
+            term["id"] = tid
+            meta = {"id": tid, "file": name}
+            for k in TERM_META_KEYS:
+                if k in term: meta[k] = term[k]
+            term_meta[tid] = meta
+
+            patterns = []
+            def add_many(values):
+                nonlocal patterns
+                if not values: return
+                if isinstance(values, str): values = [values]
+                for v in values:
+                    v = (v or "").strip()
+                    if v: patterns.append(v)
+            add_many(term.get("names"))
+            add_many(term.get("aliases"))
+            add_many(term.get("abbr"))
+            add_many(term.get("patterns"))
+            if not patterns and term.get("names"):
+                patterns = term["names"]
+
+            expanded = []
+            for ptn in patterns:
+                expanded.append(ptn)
+                if " " not in ptn:
+                    expanded.extend(self._variants_for(ptn))
+
+            uniq, seen = [], set()
+            for ptn in expanded:
+                k = (ptn or "").lower()
+                if not k or k in seen: continue
+                seen.add(k); uniq.append(ptn)
+                if not any((t or "").lower() in mutes for t in (term.get("tags") or [])):
+                    surface_claims.setdefault(k, []).append(tid)
+                    if " " not in k and "-" not in k and "/" not in k:
+                        single_word_surfaces.setdefault(len(k), []).append(k)
+            patterns_by_id[tid] = uniq
+
+        # Fuzzy matching only ever resolves to a surface with a single claimant
+        fuzzy = FuzzyIndex(k for ln in sorted(single_word_surfaces) for k in single_word_surfaces[ln]
+                           if len(surface_claims.get(k) or []) == 1)
+
+        big_regex = None; automaton = None
+        if surface_claims and engine != "regex":
+            try:
+                automaton = SurfaceAutomaton(surface_claims.keys())
+            except Exception as e:
+                _log(f"automaton build failed: {e}"); automaton = None
+        if surface_claims and automaton is None:
+            alts = sorted(surface_claims.keys(), key=len, reverse=True)
+            def esc(s: str):
+                import re as _re
+                return _re.escape(s).replace(r"\ ", " ").replace(r"\'", "'").replace(r"\-", "-").replace(r"\/", "/")
+            joined = "|".join(esc(a) for a in alts)
+            try:
+                big_regex = re.compile(r"(?<![A-Za-z0-9])(?:" + joined + r")(?![A-Za-z0-9])", re.IGNORECASE)
+            except Exception as e:
+                _log(f"regex compile failed: {e}"); big_regex = None
+
+        self._save_index_cache(key, {"term_meta": term_meta, "patterns_by_id": patterns_by_id, "tags_meta": tags_meta,
+                                     "surface_claims": surface_claims, "fuzzy": fuzzy,
+                                     "big_regex": big_regex, "automaton": automaton})
+        try:
+            LOG.log("glossary.index.load", source="build", terms=len(term_meta), ms=round((time.time() - t0) * 1000, 1))
+        except Exception:
+            pass
+        return GlossaryIndex(generation, term_meta, patterns_by_id, tags_meta,
+                             surface_claims, fuzzy, big_regex, automaton, fingerprint=key, file_hashes=file_hashes)
+
+    def _iter_surface_keys(self, idx: GlossaryIndex, text: str):
+        """Yield the lower-cased surface of each match in text, using the configured engine."""
+        if idx.automaton is not None:
+            for _s, _e, key in idx.automaton.finditer(text):
+                yield key
+        elif idx.big_regex is not None:
+            for m in idx.big_regex.finditer(text):
+                yield m.group(0).lower()
 
     def _note_text_for_fields(self, card) -> str:
         try:
@@ -505,43 +827,18 @@ class GlossaryStore:
             _log(f"note text fields error: {e}")
             return ""
 
-    def _edit_distance_limited(self, a: str, b: str, maxd: int) -> int:
-        if abs(len(a)-len(b)) > maxd: return maxd+1
-        if a == b: return 0
-        if maxd == 0: return maxd+1
-        if len(a) > len(b): a,b = b,a
-        prev = list(range(len(a)+1))
-        for i,cb in enumerate(b,1):
-            cur=[i]
-            start=max(1,i-maxd); end=min(len(a),i+maxd)
-            if start>1: cur.extend([maxd+1]*(start-1))
-            for j in range(start,end+1):
-                cost = 0 if a[j-1]==cb else 1
-                cur.append(min(prev[j]+1, cur[j-1]+1, prev[j-1]+cost))
-            if end<len(a): cur.extend([maxd+1]*(len(a)-end))
-            prev=cur
-            if min(prev)>maxd: return maxd+1
-        return prev[-1]
-
-    def _fuzzy_candidates_for_token(self, token: str, maxd: int) -> List[str]:
-        L = len(token); cand = []
-        cfg = get_config(); minlen = int(cfg.get("fuzzy_min_len", 5) or 5)
-        if L < minlen: return []
-        for ln in range(L-maxd, L+maxd+1):
-            lst = self.single_word_surfaces.get(ln)
-            if not lst: continue
-            for s in lst:
-                if token[0] != s[0]: continue
-                if self._edit_distance_limited(token, s, 1) <= 1:
-                    claimants = self.surface_claims.get(s.lower()) or []
-                    if len(claimants) == 1:
-                        cand.append(s)
-        return cand
+    def _fuzzy_candidates_for_token(self, token: str, idx: GlossaryIndex | None = None, minlen: int | None = None) -> List[str]:
+        """Single-word surfaces within one edit of token (same first letter, one claimant)."""
+        idx = idx or self._index
+        if minlen is None: minlen = int(get_config().get("fuzzy_min_len", 5) or 5)
+        if len(token) < minlen or idx.fuzzy is None: return []
+        return idx.fuzzy.lookup(token)
 
-    def _payload_for_ids_and_claims(self, ids: List[str], claims_on_card: Dict[str, List[str]]) -> Dict[str, Any]:
+    def _payload_for_ids_and_claims(self, ids: List[str], claims_on_card: Dict[str, List[str]], idx: GlossaryIndex | None = None) -> Dict[str, Any]:
+        idx = idx or self._index
         meta = {}
         for tid in ids:
-            t = self.terms_by_id.get(tid) or {}
+            t = idx.term_meta.get(tid) or {}
             title = (t.get("names") or [t.get("id")])[0]
             tags = t.get("tags", [])
             accent = icon = None
@@ -549,28 +846,29 @@ class GlossaryStore:
             if primary and isinstance(tags, list) and primary not in tags:
                 tags = [primary] + (tags or [])
             for tag in tags or []:
-                tm = (self.tags_meta.get(tag) or {})
+                tm = (idx.tags_meta.get(tag) or {})
                 if tm.get("accent") and not accent: accent = tm.get("accent")
                 if tm.get("icon") and not icon: icon = tm.get("icon")
             meta[tid] = {"title": title, "tags": tags, "accent": accent, "icon": icon}
-        terms = [{"id": tid, "patterns": self.patterns_by_id.get(tid, [])} for tid in ids]
-        obj = {"terms": terms, "meta": meta, "claims": claims_on_card}
+        # popup.js looks these literal surfaces up in the rendered card instead
+        # of compiling a regex from every pattern of every matched term
+        surfaces = sorted(([k, v] for k, v in claims_on_card.items()), key=lambda kv: -len(kv[0]))
+        obj = {"v": MATCH_PAYLOAD_VERSION, "terms": [{"id": tid} for tid in ids], "surfaces": surfaces, "meta": meta}
         # Attach live flags for UI (offline, loggedIn)
         try:
             from . import ems_pocketbase as PB
-            a = PB.load_auth() if hasattr(PB, 'load_auth') else {}
-            obj["live"] = {"offline": bool(PB.is_offline() if hasattr(PB, 'is_offline') else False),
-                           "loggedIn": bool((a or {}).get("token"))}
+            obj["live"] = PB.live_flags()
         except Exception:
             obj["live"] = {"offline": False, "loggedIn": False}
         return obj
 
     def index_payload(self, limit: int | None = None) -> Dict[str, Any]:
-        ids = sorted(self.terms_by_id.keys())
+        idx = self._index
+        ids = sorted(idx.term_meta.keys())
         if limit: ids = ids[:int(limit)]
         meta = {}
         for tid in ids:
-            t = self.terms_by_id.get(tid) or {}
+            t = idx.term_meta.get(tid) or {}
             title = (t.get("names") or [t.get("id")])[0]
             tags = t.get("tags", [])
             accent = icon = None
@@ -578,38 +876,45 @@ class GlossaryStore:
             if primary and isinstance(tags, list) and primary not in tags:
                 tags = [primary] + (tags or [])
             for tag in tags or []:
-                tm = (self.tags_meta.get(tag) or {})
+                tm = (idx.tags_meta.get(tag) or {})
                 if tm.get("accent") and not accent: accent = tm.get("accent")
                 if tm.get("icon") and not icon: icon = tm.get("icon")
             meta[tid] = {"title": title, "tags": tags, "accent": accent, "icon": icon}
-        terms = [{"id": tid, "patterns": self.patterns_by_id.get(tid, [])} for tid in ids]
-        obj = {"terms": terms, "meta": meta, "claims": {}}
+        terms = [{"id": tid, "patterns": idx.patterns_by_id.get(tid, [])} for tid in ids]
+        obj = {"terms": terms, "meta": meta, "claims": {}, "version": self.index_version(limit, idx)}
         try:
             from . import ems_pocketbase as PB
-            a = PB.load_auth() if hasattr(PB, 'load_auth') else {}
-            obj["live"] = {"offline": bool(PB.is_offline() if hasattr(PB, 'is_offline') else False),
-                           "loggedIn": bool((a or {}).get("token"))}
+            obj["live"] = PB.live_flags()
         except Exception:
             obj["live"] = {"offline": False, "loggedIn": False}
         return obj
 
+    def index_version(self, limit: int | None = None, idx: GlossaryIndex | None = None) -> str:
+        """Tag for index_payload(limit); changes whenever its content would."""
+        idx = idx or self._index
+        return f"{idx.fingerprint or idx.generation}:{int(limit or 0)}"
+
     def matches_for_card(self, card) -> Dict[str, Any]:
         try:
+            idx = self._index  # one generation for the whole computation
             text = self._note_text_for_fields(card)
-            if not text or not self.big_regex:
+            if not text or not idx.has_matcher():
                 return {"terms": [], "meta": {}}
-            h = hashlib.sha1(text.encode("utf-8")).hexdigest()
-            cache = self.card_cache.get(card.id)
-            if cache and cache.get("hash") == h:
-                return cache.get("payload") or {"terms": [], "meta": {}}
-
-            maxh = int(get_config().get("max_highlights", 100) or 100)
+            cfg = get_config()
+            # Settings that change the result are part of the key, next to the text
+            sig = f"{MATCH_PAYLOAD_VERSION}|{cfg.get('max_highlights')}|{cfg.get('fuzzy_enabled')}|{cfg.get('fuzzy_min_len')}|{cfg.get('fuzzy_max_add')}"
+            h = hashlib.sha1((sig + "\0" + text).encode("utf-8")).hexdigest()
+            ckey = (idx.fingerprint or idx.generation, h)
+            hit = self.match_cache.get(ckey)
+            if hit is not None:
+                return self._payload_for_ids_and_claims(hit[0], hit[1], idx)
+
+            maxh = int(cfg.get("max_highlights", 100) or 100)
             found_ids, seen_ids = [], set()
             claims_on_card: Dict[str, List[str]] = {}
             count = 0
-            for m in self.big_regex.finditer(text):
-                surface = m.group(0); key = surface.lower()
-                claimants = self.surface_claims.get(key) or []
+            for key in self._iter_surface_keys(idx, text):
+                claimants = idx.surface_claims.get(key) or []
                 if not claimants: continue
                 claims_on_card[key] = claimants
                 for tid in claimants:
@@ -618,15 +923,15 @@ class GlossaryStore:
                 count += 1
                 if count >= maxh: break
 
-            cfg = get_config()
             if cfg.get("fuzzy_enabled", True):
                 tokens = set(t.lower() for t in re.findall(r"[A-Za-z][A-Za-z0-9]{3,}", text))
                 added = 0; max_add = int(cfg.get("fuzzy_max_add", 6) or 6)
+                minlen = int(cfg.get("fuzzy_min_len", 5) or 5)
                 for tok in tokens:
                     if tok in claims_on_card: continue
-                    cands = self._fuzzy_candidates_for_token(tok, 1)
+                    cands = self._fuzzy_candidates_for_token(tok, idx, minlen)
                     if not cands: continue
-                    claimants = self.surface_claims.get(cands[0].lower()) or []
+                    claimants = idx.surface_claims.get(cands[0].lower()) or []
                     if len(claimants) == 1:
                         claims_on_card[cands[0].lower()] = claimants
                         tid = claimants[0]
@@ -634,9 +939,8 @@ class GlossaryStore:
                             seen_ids.add(tid); found_ids.append(tid); added += 1
                             if added >= max_add: break
 
-            payload = self._payload_for_ids_and_claims(found_ids, claims_on_card)
-            self.card_cache[card.id] = {"hash": h, "payload": payload}
-            return payload
+            self.match_cache.put(ckey, (found_ids, claims_on_card)); self._match_cache_dirty = True
+            return self._payload_for_ids_and_claims(found_ids, claims_on_card, idx)
         except Exception as e:
             _log(f"matches_for_card error: {e}")
             return {"terms": [], "meta": {}}
@@ -645,38 +949,108 @@ GLOSSARY = GlossaryStore(TERMS_DIR)
 
 # -------------------------- Updater (unchanged core) ---------------------------
 
-def _download_index_and_terms(index_url: str, terms_base: str, tmp_dir: str, bypass_cache: bool):
+def _fetch_term_bytes(url: str, deadline: float, bust: bool, token: str) -> bytes:
+    """GET one term file's raw bytes over the shared keep-alive pool, retrying
+    transient failures with exponential backoff until `deadline`."""
+    final = _cache_bust(url, token) if bust else url
+    headers = {"User-Agent": "EMSGlossary/2.0 (+anki)", "Cache-Control": "no-cache", "Pragma": "no-cache"}
+    delay = 0.5; last: Exception | None = None
+    for attempt in range(FETCH_ATTEMPTS):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        try:
+            r = HTTP.request("GET", final, headers=headers, timeout=min(25.0, remaining))
+            if r.status == 200:
+                return r.body
+            last = HTTP.HTTPStatusError(r.status, url)
+            # 4xx (other than timeout / rate limit) will not fix itself
+            if 400 <= r.status < 500 and r.status not in (408, 429):
+                raise last
+        except HTTP.HTTPStatusError:
+            raise
+        except Exception as e:
+            last = e
+        if attempt + 1 < FETCH_ATTEMPTS:
+            time.sleep(max(0.0, min(delay + random.uniform(0, delay / 2), deadline - time.time())))
+            delay *= 2
+    raise last or RuntimeError("deadline exceeded")
+
+def _fetch_terms_parallel(entries: List[Tuple[str, str]], tmp_dir: str, bypass_cache: bool, token: str):
+    """Download [(basename, url), ...] concurrently. Returns (raw, hashes, fetch_errors,
+    transient) in the order of `entries`; `raw` holds each file's bytes and `hashes`
+    their sha1, as in index.json. `transient` lists failures worth retrying
+    (network errors, 5xx, deadline) as opposed to 4xx responses."""
+    hashes = {}; raw = {}; fetch_errors = {}; transient = []
+    if not entries:
+        return raw, hashes, fetch_errors, transient
+    deadline = time.time() + FETCH_DEADLINE_S
+    ex = ThreadPoolExecutor(max_workers=max(1, min(FETCH_WORKERS, len(entries))), thread_name_prefix="ems-fetch")
+    try:
+        futures = [(base, ex.submit(_fetch_term_bytes, url, deadline, bypass_cache, token)) for base, url in entries]
+        for base, fut in futures:
+            try:
+                data = fut.result(timeout=max(0.0, deadline - time.time()) + 30)
+            except Exception as e:
+                fetch_errors[base] = f"Download failed: {str(e) or 'deadline exceeded'}"
+                if not (isinstance(e, HTTP.HTTPStatusError) and 400 <= e.status < 500):
+                    transient.append(base)
+                continue
+            try:
+                json.loads(data)
+            except Exception as e:
+                fetch_errors[base] = f"Invalid JSON: {e}"
+            try:
+                with open(os.path.join(tmp_dir, base), "wb") as fh: fh.write(data)
+            except Exception as e:
+                _log(f"tmp write failed for {base}: {e}")
+            raw[base] = data
+            hashes[base] = hashlib.sha1(data).hexdigest()
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+    return raw, hashes, fetch_errors, transient
+
+def _download_index_and_terms(index_url: str, terms_base: str, tmp_dir: str, bypass_cache: bool, known: Dict[str, str] | None = None, validators: Dict[str, str] | None = None):
+    """Fetch index.json and the term files it lists. Entries that carry a sha1
+    equal to `known[basename]` (a file we already hold) are not downloaded;
+    they are reported in meta["unchanged"]. meta["files"] lists every basename.
+    With `validators` the index request is conditional; on 304 nothing else is
+    fetched and meta["not_modified"] is True."""
     token = str(int(time.time())) + "-" + uuid.uuid4().hex[:6] if bypass_cache else ""
     try:
-        idx = _http_json(index_url, bust=bypass_cache, token=token)
+        status, text, newv = _http_text_conditional(index_url, bust=bypass_cache, token=token, validators=validators)
+        if status == 304:
+            return {}, {}, {"not_modified": True, "validators": newv}, {}
+        idx = _parse_fetched_json(text, index_url)
     except Exception as e:
         raise RuntimeError(f"Index parse error:\n{e}")
     files = idx.get("files")
     if not isinstance(files, list) or not files:
         raise RuntimeError("index.json must contain a non-empty 'files' array.")
     os.makedirs(tmp_dir, exist_ok=True)
-    hashes = {}; raw = {}; fetch_errors = {}
+    known = known or {}
+    entries = []; listed = []; unchanged = []
     for entry in files:
         fname = entry if isinstance(entry, str) else entry.get("file")
         if not fname: continue
+        base = os.path.basename(fname)
+        listed.append(base)
+        remote_sha = entry.get("sha1") if isinstance(entry, dict) else None
+        if remote_sha and known.get(base) == remote_sha:
+            unchanged.append(base); continue
         url = fname if isinstance(fname, str) and fname.startswith("http") else f"{terms_base.rstrip('/')}/{fname}"
-        try:
-            data = _http_text(url, bust=bypass_cache, token=token)
-            try:
-                json.loads(data)
-            except Exception as e:
-                fetch_errors[os.path.basename(fname)] = f"Invalid JSON: {e}"
-            local = os.path.join(tmp_dir, os.path.basename(fname))
-            with open(local, "w", encoding="utf-8") as fh: fh.write(data)
-            raw[os.path.basename(fname)] = data
-            hashes[os.path.basename(fname)] = _sha1(data)
-        except Exception as e:
-            fetch_errors[os.path.basename(fname)] = f"Download failed: {e}"
-    meta = {"version": idx.get("version", "?")}
+        entries.append((base, url))
+    t0 = time.time()
+    raw, hashes, fetch_errors, transient = _fetch_terms_parallel(entries, tmp_dir, bypass_cache, token)
+    try:
+        LOG.log("glossary.update.fetch", files=len(listed), fetched=len(entries), unchanged=len(unchanged), ok=len(raw), failed=len(fetch_errors), ms=round((time.time() - t0) * 1000, 1))
+    except Exception:
+        pass
+    meta = {"version": idx.get("version", "?"), "files": listed, "unchanged": unchanged, "transient": transient, "validators": newv}
     return raw, hashes, meta, fetch_errors
 
-def _validate_term_json(text: str, fname: str):
-    try: obj = json.loads(text)
+def _validate_term_json(data: bytes, fname: str):
+    try: obj = json.loads(data)
     except Exception as e: return False, f"JSON parse error: {str(e)}", {}
     idv = obj.get("id") or os.path.splitext(os.path.basename(fname))[0]
     obj["id"] = idv
@@ -687,19 +1061,29 @@ def _validate_term_json(text: str, fname: str):
             return False, f"Field '{listy}' must be a list.", {}
     return True, "", obj
 
-def _download_optional(urls: list, bypass_cache: bool):
-    token = str(int(time.time()))
-    for u in urls:
-        try: return _http_text(u, bust=bypass_cache, token=token)
-        except Exception as e: _log(f"optional fetch failed for {u}: {e}")
-    return ""
-
-def _download_tags(tmp_state_dir: str, bypass_cache: bool):
-    data = _download_optional(["https://raw.githubusercontent.com/EnterMedSchool/Anki/main/glossary/tags.json"], bypass_cache=bypass_cache)
-    if data:
+def _download_tags(tmp_state_dir: str, bypass_cache: bool, validators: Dict[str, str] | None = None):
+    """Fetch tags.json into tmp_state_dir unless the server answers 304.
+    Returns the validators to store for the next conditional request."""
+    try:
+        status, data, newv = _http_text_conditional(RAW_TAGS, bust=bypass_cache, token=str(int(time.time())), validators=validators)
+    except Exception as e:
+        _log(f"optional fetch failed for {RAW_TAGS}: {e}"); return validators
+    if status == 200 and data:
         os.makedirs(tmp_state_dir, exist_ok=True)
         with open(os.path.join(tmp_state_dir, "tags.json"), "w", encoding="utf-8") as fh:
             fh.write(data)
+    return newv
+
+def _apply_downloaded_tags(tmp_state_dir: str) -> bool:
+    try:
+        new_tags = open(os.path.join(tmp_state_dir, "tags.json"), "r", encoding="utf-8").read()
+        old_tags = open(TAGS_JSON_PATH, "r", encoding="utf-8").read() if os.path.exists(TAGS_JSON_PATH) else None
+        if new_tags != old_tags:
+            shutil.move(os.path.join(tmp_state_dir, "tags.json"), TAGS_JSON_PATH)
+            return True
+    except Exception:
+        pass
+    return False
 
 def _changelog(prev: Dict[str, str], new: Dict[str, str]):
     prev_names = set(prev.keys()); new_names = set(new.keys())
@@ -708,46 +1092,92 @@ def _changelog(prev: Dict[str, str], new: Dict[str, str]):
     updated = sorted([n for n in (new_names & prev_names) if prev.get(n) != new.get(n)])
     return added, updated, removed
 
-def update_from_remote(bypass_cache: bool = True):
+def _write_bytes_atomic(path: str, data: bytes) -> None:
+    # Bytes as served: no newline translation, so the file's sha1 matches index.json
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as fh: fh.write(data)
+    os.replace(tmp_path, path)
+
+def update_from_remote(bypass_cache: bool = True, full: bool = False):
+    """Sync TERMS_DIR with the remote index. Only added/changed files are
+    downloaded and written, removed ones are deleted; `full` ignores the
+    local snapshot and re-downloads everything."""
     index_url = RAW_INDEX; terms_base = RAW_TERMS_BASE
     try:
-        LOG.log("glossary.update.start", bypass_cache=bool(bypass_cache))
+        LOG.log("glossary.update.start", bypass_cache=bool(bypass_cache), full=bool(full))
     except Exception:
         pass
     tmp = os.path.join(USER_FILES_DIR, f"tmp_fetch_{int(time.time())}")
     tmp_state = os.path.join(USER_FILES_DIR, f"tmp_state_{int(time.time())}")
     try:
-        raw, hashes, meta, fetch_errors = _download_index_and_terms(index_url, terms_base, tmp, bypass_cache=bypass_cache)
-        _download_tags(tmp_state, bypass_cache=bypass_cache)
-        ok_files = {}; errors = dict(fetch_errors)
-        for fname, text in raw.items():
-            ok, err, obj = _validate_term_json(text, fname)
-            if ok: ok_files[fname] = text
-            else: errors[fname] = err
-        if not ok_files and errors:
-            raise RuntimeError("All files invalid.\n" + "\n".join(f"{k}: {v}" for k, v in errors.items()))
-
         prev = {}
         if os.path.exists(LAST_INDEX_SNAPSHOT):
             try: prev = json.load(open(LAST_INDEX_SNAPSHOT, "r", encoding="utf-8")) or {}
             except Exception: prev = {}
-        valid_hashes = {k: v for k, v in hashes.items() if k in ok_files}
+        # Files we hold locally with a known hash can be skipped when the index agrees;
+        # a copy whose bytes differ from the snapshot (e.g. newline-translated) is fetched again
+        on_disk = GLOSSARY.index.file_hashes
+        known = {} if full else {k: v for k, v in prev.items()
+                                 if os.path.isfile(os.path.join(TERMS_DIR, k)) and on_disk.get(k, v) == v}
+        # Revalidate only while the local copy is complete; otherwise fetch the index in full
+        validators = _load_validators() if (prev and len(known) == len(prev)) else {}
+        raw, hashes, meta, fetch_errors = _download_index_and_terms(index_url, terms_base, tmp, bypass_cache=bypass_cache, known=known, validators=validators.get(index_url))
+        tags_v = _download_tags(tmp_state, bypass_cache=bypass_cache, validators=None if full else validators.get(RAW_TAGS))
+        tags_changed = _apply_downloaded_tags(tmp_state)
+        _save_validators(RAW_TAGS, tags_v)
+        if meta.get("not_modified"):
+            if tags_changed:
+                GLOSSARY.reload()
+            cfg = get_config(); cfg["last_update_check"] = int(time.time()); write_config(cfg)
+            version = "?"
+            try: version = open(LAST_VERSION, "r", encoding="utf-8").read().strip() or "?"
+            except Exception: pass
+            try:
+                LOG.log("glossary.update.not_modified", version=version, tags_changed=tags_changed)
+            except Exception:
+                pass
+            return True, f"EMS Glossary is up to date ({version}).", ""
+        ok_files = {}; errors = dict(fetch_errors)
+        for fname, data in raw.items():
+            ok, err, obj = _validate_term_json(data, fname)
+            if ok: ok_files[fname] = data
+            else: errors[fname] = err
+        unchanged = meta.get("unchanged") or []
+        if not ok_files and not unchanged and errors:
+            raise RuntimeError("All files invalid.\n" + "\n".join(f"{k}: {v}" for k, v in errors.items()))
+
+        valid_hashes = {k: prev[k] for k in unchanged}
+        valid_hashes.update({k: v for k, v in hashes.items() if k in ok_files})
+        # A file that failed this time keeps its previous local copy
+        for k in errors:
+            if k in known: valid_hashes[k] = known[k]
         added, updated, removed = _changelog(prev, valid_hashes)
 
-        if os.path.isdir(TERMS_DIR): shutil.rmtree(TERMS_DIR, ignore_errors=True)
         os.makedirs(TERMS_DIR, exist_ok=True)
-        for fname, text in ok_files.items():
-            with open(os.path.join(TERMS_DIR, fname), "w", encoding="utf-8") as fh: fh.write(text)
-        try: shutil.move(os.path.join(tmp_state, "tags.json"), TAGS_JSON_PATH)
+        for fname, data in ok_files.items():
+            if prev.get(fname) == hashes.get(fname) and fname in known: continue
+            _write_bytes_atomic(os.path.join(TERMS_DIR, fname), data)
+        stale = [n for n in os.listdir(TERMS_DIR) if n.lower().endswith(".json") and n not in valid_hashes]
+        for n in stale:
+            try: os.remove(os.path.join(TERMS_DIR, n))
+            except Exception as e: _log(f"remove stale term {n} failed: {e}")
+
+        prev_version = ""
+        try: prev_version = open(LAST_VERSION, "r", encoding="utf-8").read().strip()
         except Exception: pass
-
+        changed = bool(added or updated or removed or stale)
         json.dump(valid_hashes, open(LAST_INDEX_SNAPSHOT, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
-        json.dump({"added": added, "updated": updated, "removed": removed}, open(LAST_DIFF, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
-        with open(LAST_VERSION, "w", encoding="utf-8") as fh: fh.write(str(meta.get("version", "?")))
-        try: os.remove(SEEN_VERSION)
-        except Exception: pass
+        # Only trust a 304 next time if no file failed for a reason a retry could fix
+        _save_validators(index_url, None if meta.get("transient") else meta.get("validators"))
+        if changed or str(meta.get("version", "?")) != prev_version:
+            json.dump({"added": added, "updated": updated, "removed": removed}, open(LAST_DIFF, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
+            with open(LAST_VERSION, "w", encoding="utf-8") as fh: fh.write(str(meta.get("version", "?")))
+            try: os.remove(SEEN_VERSION)
+            except Exception: pass
 
-        GLOSSARY._load_tags_palette(); GLOSSARY.reload()
+        if changed or tags_changed: GLOSSARY.reload()
+        try: build_html_pack()
+        except Exception as e: _log(f"html pack build failed: {e}")
         cfg = get_config(); cfg["last_update_check"] = int(time.time()); write_config(cfg)
 
         summary = f"EMS Glossary updated to {meta.get('version','?')}.  Added {len(added)}, Updated {len(updated)}, Removed {len(removed)}."
@@ -1100,29 +1530,139 @@ def _term_html_from_schema(t: Dict[str, Any]) -> str:
     html_out = "<div class='ems-body'>" + "".join(parts) + "</div>"
     return _sanitize_html(html_out)
 
-def GlossaryStore_popup_payload(self, term_id: str) -> Dict[str, Any]:
-    t = self.terms_by_id.get(term_id)
-    if not t:
-        return {"id": term_id, "html": "<div class='ems-popover'><em>No entry.</em></div>", "title": term_id}
+def _render_popup(t: Dict[str, Any]) -> Tuple[str, str]:
+    """(title, sanitized popup HTML) for a full term body."""
+    title = (t.get("names") or [t.get("id")])[0]
     if t.get("html"):
         core = _sanitize_html(t.get("html", ""))
         if "<div class='ems-brand'" not in core: core += _brand_block_html(t.get("id"))
-        obj = {"id": t.get("id"), "html": "<div class='ems-body'>" + core + "</div>", "title": (t.get("names") or [t.get("id")])[0]}
+        return title, "<div class='ems-body'>" + core + "</div>"
+    return title, _term_html_from_schema(t)
+
+def GlossaryStore_rendered_popup(self, term_id: str) -> Tuple[str, str] | None:
+    """Rendered popup for a term, cached until that term's file changes."""
+    idx = self._index
+    if term_id not in idx.term_meta: return None
+    key = (term_id, idx.content_key(term_id))
+    hit = self._html.get(key)
+    if hit is not None: return hit
+    out = self._packed_popup(term_id, key[1])
+    if out is None:
+        t = self._term_body(idx, term_id)
+        if not t: return None
+        out = _render_popup(t)
+    self._html.put(key, out)
+    return out
+GlossaryStore.rendered_popup = GlossaryStore_rendered_popup
+
+# Prerendered popups live in HTML_PACK_PATH: one JSON header line
+# {"format", "pkg", "entries": {id: [offset, length, sha1, title]}} followed by
+# the UTF-8 HTML fragments back to back. Entries are only served while their
+# sha1 matches the term file on disk, so a stale pack degrades to live rendering.
+# The pack is replaced atomically on rebuild; a header is only used to read the
+# exact file it came from (same file id), never a newer one at old offsets.
+
+def _pack_file_id(fh) -> Tuple[int, int, int]:
+    st = os.fstat(fh.fileno())
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _read_html_pack_header():
+    """(entries, body offset, file id) of a pack written for this add-on, or None."""
+    try:
+        with open(HTML_PACK_PATH, "rb") as fh:
+            fid = _pack_file_id(fh)
+            head = json.loads(fh.readline().decode("utf-8"))
+            base = fh.tell()
+        if head.get("format") != HTML_PACK_FORMAT or head.get("pkg") != mw.addonManager.addonFromModule(MODULE):
+            return None
+        return head.get("entries") or {}, base, fid
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        _log(f"html pack header read failed: {e}")
+        return None
+
+def GlossaryStore_packed_popup(self, term_id: str, content_key: str) -> Tuple[str, str] | None:
+    # One local snapshot: build_html_pack may reset self._pack from another thread
+    pack = self._pack
+    if pack is None:
+        pack = self._pack = _read_html_pack_header() or ({}, 0, None)
+    entries, base, fid = pack
+    e = entries.get(term_id)
+    if not e or e[2] != content_key or fid is None: return None
+    try:
+        with open(HTML_PACK_PATH, "rb") as fh:
+            if _pack_file_id(fh) != fid:
+                # Pack was rebuilt since this header was read; render live, reload next time
+                if self._pack is pack: self._pack = None
+                return None
+            fh.seek(base + e[0]); data = fh.read(e[1])
+        if len(data) != e[1]: return None
+        return e[3], data.decode("utf-8")
+    except Exception as ex:
+        _log(f"html pack read {term_id} failed: {ex}"); return None
+GlossaryStore._packed_popup = GlossaryStore_packed_popup
+
+_HTML_PACK_LOCK = threading.Lock()
+
+def build_html_pack() -> int:
+    """Prerender every term's popup into HTML_PACK_PATH. Fragments whose term file
+    is unchanged are copied from the previous pack; returns how many were rendered."""
+    with _HTML_PACK_LOCK:
+        t0 = time.time()
+        idx = GLOSSARY.index
+        old = _read_html_pack_header()
+        old_entries, old_base, old_fid = old or ({}, 0, None)
+        want = {tid: idx.content_key(tid) for tid in idx.term_meta}
+        if old and set(old_entries) == set(want) and all(old_entries[t][2] == ck for t, ck in want.items()):
+            return 0
+        entries: Dict[str, List[Any]] = {}; chunks: List[bytes] = []; pos = 0; rendered = 0
+        src = open(HTML_PACK_PATH, "rb") if old else None
+        if src is not None and _pack_file_id(src) != old_fid:
+            src.close(); src = None  # replaced under us; render everything
         try:
-            from . import ems_pocketbase as PB
-            a = PB.load_auth() if hasattr(PB, 'load_auth') else {}
-            obj["live"] = {"offline": bool(PB.is_offline() if hasattr(PB, 'is_offline') else False),
-                           "loggedIn": bool((a or {}).get("token"))}
+            for tid in sorted(want):
+                ck = want[tid]; e = old_entries.get(tid); data = None
+                if e and e[2] == ck and src is not None:
+                    try:
+                        src.seek(old_base + e[0]); data = src.read(e[1]); title = e[3]
+                    except Exception:
+                        data = None
+                if data is None:
+                    try:
+                        # read directly so the pass does not flush the body LRU
+                        with open(os.path.join(GLOSSARY.terms_dir, idx.term_meta[tid]["file"]), "r", encoding="utf-8") as fh: t = json.load(fh)
+                        t["id"] = tid
+                        title, html_out = _render_popup(t)
+                    except Exception as ex:
+                        _log(f"prerender {tid} failed: {ex}"); continue
+                    data = html_out.encode("utf-8"); rendered += 1
+                entries[tid] = [pos, len(data), ck, title]
+                chunks.append(data); pos += len(data)
+        finally:
+            if src is not None: src.close()
+        head = {"format": HTML_PACK_FORMAT, "pkg": mw.addonManager.addonFromModule(MODULE), "entries": entries}
+        tmp_path = HTML_PACK_PATH + ".part"
+        with open(tmp_path, "wb") as fh:
+            fh.write(json.dumps(head, ensure_ascii=False).encode("utf-8") + b"\n")
+            for c in chunks: fh.write(c)
+        os.replace(tmp_path, HTML_PACK_PATH)
+        GLOSSARY._pack = None  # reopen on next popup
+        try:
+            LOG.log("glossary.html_pack.build", terms=len(entries), rendered=rendered, ms=round((time.time() - t0) * 1000, 1))
         except Exception:
-            obj["live"] = {"offline": False, "loggedIn": False}
-        return obj
-    html_out = _term_html_from_schema(t); title = (t.get("names") or [t.get("id")])[0]
-    obj = {"id": t.get("id"), "html": html_out, "title": title}
+            pass
+        return rendered
+
+def GlossaryStore_popup_payload(self, term_id: str) -> Dict[str, Any]:
+    r = self.rendered_popup(term_id)
+    if r is None:
+        return {"id": term_id, "html": "<div class='ems-popover'><em>No entry.</em></div>", "title": term_id}
+    title, html_out = r
+    obj = {"id": term_id, "html": html_out, "title": title}
     try:
         from . import ems_pocketbase as PB
-        a = PB.load_auth() if hasattr(PB, 'load_auth') else {}
-        obj["live"] = {"offline": bool(PB.is_offline() if hasattr(PB, 'is_offline') else False),
-                       "loggedIn": bool((a or {}).get("token"))}
+        obj["live"] = PB.live_flags()
     except Exception:
         obj["live"] = {"offline": False, "loggedIn": False}
     return obj
@@ -1277,6 +1817,61 @@ def _add_learn_all(term: Dict[str, Any], reviewer) -> Tuple[int, int]:
 
 # ------------------------- JS bridge (new commands) ----------------------------
 
+_POPUP_EXECUTOR: ThreadPoolExecutor | None = None
+_POPUP_INFLIGHT: set = set()
+_POPUP_LOCK = threading.Lock()
+
+def _context_can_eval(ctx) -> bool:
+    """True if results can be pushed back into this webview (see _safe_eval_js_on_context)."""
+    try:
+        return callable(getattr(ctx, "eval", None)) or callable(getattr(getattr(ctx, "web", None), "eval", None))
+    except Exception:
+        return False
+
+def _popup_reply(term_id: str) -> Dict[str, Any]:
+    """Popup payload for the bridge; never raises. Safe to call off the main thread."""
+    try:
+        payload = GLOSSARY.popup_payload(term_id)
+    except Exception:
+        LOG.log("glossary.error", id=term_id, error="payload build failed")
+        return {"id": term_id, "html": "<div class='ems-body'><div class='ems-small'>No entry.</div></div>", "title": term_id}
+    # Best-effort: ensure PB has JSON credits for analytics; run in background
+    try:
+        t = GLOSSARY.term(term_id) or {}
+        creds = t.get("credits") or []
+        if creds:
+            def _run():
+                try:
+                    from . import ems_pocketbase as PB
+                    PB.credits_ensure(term_id, creds)
+                except Exception:
+                    pass
+            threading.Thread(target=_run, daemon=True).start()
+    except Exception:
+        pass
+    LOG.log("glossary.payload", id=term_id, bytes=len((payload.get('html') or '').encode('utf-8')))
+    return payload
+
+def _popup_payload_async(term_id: str, context) -> None:
+    """Build the popup payload on a worker and deliver it to the webview. A term
+    already being built is not queued twice; popup.js fans the one result out."""
+    global _POPUP_EXECUTOR
+    key = (term_id, id(context))
+    with _POPUP_LOCK:
+        if key in _POPUP_INFLIGHT: return
+        _POPUP_INFLIGHT.add(key)
+        if _POPUP_EXECUTOR is None:
+            _POPUP_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ems-popup")
+    def work():
+        try:
+            payload = _popup_reply(term_id)
+        finally:
+            with _POPUP_LOCK: _POPUP_INFLIGHT.discard(key)
+        js = f"try{{ if(window.EMSGlossary && EMSGlossary.deliverTerm) EMSGlossary.deliverTerm({json.dumps(term_id)}, {json.dumps(payload)}); }}catch(e){{}}"
+        try: mw.taskman.run_on_main(lambda: _safe_eval_js_on_context(context, js))
+        except Exception as e: _log(f"popup deliver failed: {e}")
+    _POPUP_EXECUTOR.submit(work)
+
 def on_js_message(handled, message: str, context):
     # Accept messages from any webview for read-only commands (get),
     # but restrict actions (learn/pin) to the Reviewer.
@@ -1310,6 +1905,15 @@ def on_js_message(handled, message: str, context):
             pass
         return (True, {"ok": True})
 
+    if cmd == "index":
+        # full term index for the drawer and cards without matches; popup.js
+        # caches it per webview and only asks again when the version changes
+        try:
+            return (True, GLOSSARY.index_payload(limit=_index_limit(get_config())))
+        except Exception as e:
+            _log(f"index payload failed: {e}")
+            return (True, {"terms": [], "meta": {}})
+
     if cmd == "suggest":
         # open suggest dialog with prefilled name; reviewer only
         if not is_reviewer:
@@ -1342,34 +1946,21 @@ def on_js_message(handled, message: str, context):
 
     if cmd == "get":
         term_id = parts[2].strip()
-        try:
-            LOG.log("glossary.open", id=term_id)
+        LOG.log("glossary.open", id=term_id)
+        # Leo reacts after the reply has gone out, not before
+        def _leo():
             try:
                 from .LeoTamagotchi import gui as _leo_tamagotchi
                 _leo_tamagotchi.show_temp_character("LeoCuriousLearning", seconds=10)
             except Exception as e:
                 LOG.log("tamagotchi.error", where="on term open", error=str(e))
-            payload = GLOSSARY.popup_payload(term_id)
-            # Best-effort: ensure PB has JSON credits for analytics; run in background
-            try:
-                t = (GLOSSARY.terms_by_id or {}).get(term_id) or {}
-                creds = t.get("credits") or []
-                if creds:
-                    import threading
-                    def _run():
-                        try:
-                            from . import ems_pocketbase as PB
-                            PB.credits_ensure(term_id, creds)
-                        except Exception:
-                            pass
-                    threading.Thread(target=_run, daemon=True).start()
-            except Exception:
-                pass
-            LOG.log("glossary.payload", id=term_id, bytes=len((payload.get('html') or '').encode('utf-8')))
-            return (True, payload)
-        except Exception:
-            LOG.log("glossary.error", id=term_id, error="payload build failed")
-            return (True, {"id": term_id, "html": "<div class='ems-body'><div class='ems-small'>No entry.</div></div>", "title": term_id})
+        try: mw.taskman.run_on_main(_leo)
+        except Exception: _leo()
+        if _context_can_eval(context):
+            # Built on a worker and pushed with EMSGlossary.deliverTerm
+            _popup_payload_async(term_id, context)
+            return (True, {"id": term_id, "pending": True})
+        return (True, _popup_reply(term_id))
 
     if cmd == "rate":
         # rating commands: rate:get:tid  or rate:set:tid:stars
@@ -1380,6 +1971,13 @@ def on_js_message(handled, message: str, context):
                 from . import ems_pocketbase as PB
             except Exception:
                 PB = None
+            # Prefetched with the card: answer right away so the bar paints without a round trip
+            try:
+                cached = PB.rating_cached(tid) if PB else None
+            except Exception:
+                cached = None
+            if cached is not None:
+                return (True, {"ok": True, "avg": cached.get("avg") or 0, "count": cached.get("count") or 0, "mine": cached.get("mine")})
             # Kick off background fetch to avoid blocking UI; return fast placeholder
 
             def _bg():
@@ -1560,18 +2158,33 @@ gui_hooks.webview_did_receive_js_message.append(on_js_message)
 
 # ------------------------------- Injection ------------------------------------
 
+def _index_limit(cfg: Dict[str, Any]) -> int:
+    return int(cfg.get("ship_index_limit", 3000) or 3000)
+
+def _prefetch_ratings(term_ids: List[str]) -> None:
+    """Queue a card's terms for the rating prefetch worker (one request per batch)."""
+    try:
+        from . import ems_pocketbase as PB
+        PB.rating_prefetch_async(term_ids)
+    except Exception as e:
+        _log(f"rating prefetch failed: {e}")
+
 def inject_on_card(text: str, card, kind: str) -> str:
     try:
+        cfg = get_config()
         payload = GLOSSARY.matches_for_card(card)
+        # The full index is fetched once per webview over the bridge
+        # ("ems_glossary:index") and cached by popup.js under this version.
+        payload["indexVersion"] = GLOSSARY.index_version(_index_limit(cfg))
         if not payload.get("terms"):
-            cfg = get_config()
-            if cfg.get("ship_index_if_no_matches", True):
-                limit = int(cfg.get("ship_index_limit", 3000) or 3000)
-                payload = GLOSSARY.index_payload(limit=limit)
-                if not payload.get("terms"):
-                    return text
+            if not cfg.get("ship_index_if_no_matches", True) or not GLOSSARY.term_meta:
+                return text
+            payload = {"useIndex": True, "indexVersion": payload["indexVersion"]}
+        elif cfg.get("prefetch_ratings", True):
+            _prefetch_ratings([t["id"] for t in payload["terms"]])
+        # Only the latest card's payload is queued; older cards are gone from the DOM.
         js = f"""
-<script>(function(p){{window.__EMS_PAYLOAD = window.__EMS_PAYLOAD || []; window.__EMS_PAYLOAD.push(p); if (window.EMSGlossary && window.EMSGlossary.setup) {{ try {{ window.EMSGlossary.setup(p); }} catch(e){{ console && console.warn('EMS setup error', e); }} }} }})
+<script>(function(p){{if (window.EMSGlossary && window.EMSGlossary.setup) {{ try {{ window.EMSGlossary.setup(p); }} catch(e){{ console && console.warn('EMS setup error', e); }} }} else {{ window.__EMS_PAYLOAD = [p]; }} }})
 ({json.dumps(payload)});
 </script>
 """
@@ -1582,6 +2195,18 @@ def inject_on_card(text: str, card, kind: str) -> str:
 
 gui_hooks.card_will_show.append(inject_on_card)
 
+def _on_profile_will_close() -> None:
+    try: GLOSSARY.save_match_cache()
+    except Exception as e: _log(f"save match cache failed: {e}")
+    try:
+        from . import ems_pocketbase as PB
+        PB.flush_state()
+        # State is already on disk; the push runs on the worker, never blocking the GUI here
+        PB.tamagotchi_push_now()
+    except Exception as e: _log(f"flush pocketbase state failed: {e}")
+
+gui_hooks.profile_will_close.append(_on_profile_will_close)
+
 # ------------------------------- Settings UI ----------------------------------
 
 def _ensure_logo_icon() -> QIcon:
@@ -3108,12 +3733,13 @@ class SuggestTermDialog(QDialog):
                 return {}
             # quick id check by slug
             slug = self._slugify(names[0]) if names else ""
-            if slug and slug in GLOSSARY.terms_by_id:
-                return GLOSSARY.terms_by_id.get(slug) or {}
-            for t in (GLOSSARY.terms_by_id or {}).values():
-                for n in (t.get("names") or []):
+            if slug and slug in GLOSSARY.term_meta:
+                return GLOSSARY.term(slug) or {}
+            # Match against the in-memory index; only the hit's body is read from disk
+            for tid, meta in (GLOSSARY.term_meta or {}).items():
+                for n in (meta.get("names") or []):
                     if (n or "").strip().lower() in want:
-                        return t
+                        return GLOSSARY.term(tid) or {}
         except Exception:
             pass
         return {}
@@ -3745,9 +4371,9 @@ def _build_menu():
         try: menu.clear()
         except Exception: pass
 
-        def run_update(background=True):
+        def run_update(background=True, full=False):
             def worker():
-                ok, summary, details = update_from_remote(bypass_cache=True)
+                ok, summary, details = update_from_remote(bypass_cache=True, full=full)
                 def show():
                     if ok:
                         if details: showText(details, title="EnterMedSchool — Update Report"); showInfo(summary)
@@ -3761,7 +4387,7 @@ def _build_menu():
         a1 = QAction("Check for Updates Now (Bypass Cache)", mw)
         qconnect(a1.triggered, lambda: run_update(background=True)); menu.addAction(a1)
         a2 = QAction("Force Full Resync (Bypass Cache)", mw)
-        qconnect(a2.triggered, lambda: run_update(background=True)); menu.addAction(a2)
+        qconnect(a2.triggered, lambda: run_update(background=True, full=True)); menu.addAction(a2)
 
         menu.addSeparator()
         aDiag = QAction("Diagnostics: Show last fetched index", mw)
@@ -3886,18 +4512,9 @@ def _build_menu():
         def _reconn():
             try:
                 from . import ems_pocketbase as PB
+                # The menu is rebuilt by _on_connectivity_changed once the probe succeeds
                 PB.try_reconnect(background=True)
                 tooltip("Attempting reconnect...")
-                # Rebuild the menu shortly after to reflect status
-                import threading, time as _t
-                def _later():
-                    try: _t.sleep(0.8)
-                    except Exception: pass
-                    try: mw.taskman.run_on_main(_build_menu)
-                    except Exception:
-                        try: _build_menu()
-                        except Exception: pass
-                threading.Thread(target=_later, daemon=True).start()
             except Exception:
                 pass
         qconnect(aReconnect.triggered, _reconn)
@@ -3909,15 +4526,8 @@ def _build_menu():
             offline = bool(PB.is_offline())
             auth = PB.load_auth() or {}
             email = ((auth.get('record') or {}).get('email')) or None
-            # Read last offline reason for tooltip if present
-            try:
-                import json
-                stp = os.path.join(STATE_DIR, "offline_state.json")
-                reason = ""
-                if os.path.exists(stp):
-                    reason = (json.load(open(stp, "r", encoding="utf-8")) or {}).get("reason") or ""
-            except Exception:
-                reason = ""
+            # Last offline reason for the tooltip
+            reason = PB.offline_reason() if offline else ""
         except Exception:
             offline = False; email = None; reason = ""
         label = "Status: Offline" if offline else ("Status: Online" + (f" ({email})" if email else ""))
@@ -3939,12 +4549,27 @@ def _build_menu():
     except Exception as e:
         _log(f"build menu failed: {e}")
 
+def _on_connectivity_changed(offline: bool) -> None:
+    """Connectivity monitor subscriber: refresh the menu status and the popup live flags."""
+    def _apply():
+        _build_menu()
+        try:
+            from . import ems_pocketbase as PB
+            js = f"try{{ if(window.EMSGlossary && EMSGlossary.setLive) EMSGlossary.setLive({json.dumps(PB.live_flags())}); }}catch(e){{}}"
+            if getattr(mw, 'reviewer', None) and getattr(mw.reviewer, 'web', None):
+                mw.reviewer.web.eval(js)
+        except Exception as e:
+            _log(f"push live flags failed: {e}")
+    try: mw.taskman.run_on_main(_apply)
+    except Exception as e: _log(f"connectivity update failed: {e}")
+
 def _on_profile_open():
     _build_menu(); 
     try: 
         # try to clear offline if PB is reachable
         try:
             from . import ems_pocketbase as PB
+            PB.subscribe_connectivity(_on_connectivity_changed)
             PB.try_reconnect(background=True)
         except Exception:
             pass
@@ -3968,8 +4593,14 @@ def _on_profile_open():
             pass
         # auto update (respect last checked)
         last = int(get_config().get("last_update_check", 0))
-        if int(time.time()) - last >= AUTO_UPDATE_DAYS*86400:
-            threading.Thread(target=lambda: update_from_remote(bypass_cache=True), daemon=True).start()
+        due = int(time.time()) - last >= AUTO_UPDATE_DAYS*86400
+        def _auto():
+            # Conditional request: lets the CDN answer and ends early on 304
+            if due: update_from_remote(bypass_cache=False)
+            # (Re)build prerendered popups if missing or stale; no-op otherwise
+            try: build_html_pack()
+            except Exception as e: _log(f"html pack build failed: {e}")
+        threading.Thread(target=_auto, daemon=True).start()
     except Exception as e:
         _log(f"auto update failed: {e}")
 gui_hooks.profile_did_open.append(_on_profile_open)
@@ -0,0 +1,190 @@
+from __future__ import annotations
+import http.client, ssl, threading, urllib.error, urllib.parse, urllib.request, zlib
+from typing import Dict, List, Optional, Tuple
+
+# Small keep-alive HTTP client. urllib opens (and TLS-handshakes) a fresh
+# connection for every request; this keeps idle connections per host so
+# repeated calls to the same server reuse one socket, caps how many requests
+# run against one host at a time, and decodes gzip/deflate response bodies.
+
+_REDIRECTS = (301, 302, 303, 307, 308)
+
+
+class HTTPStatusError(Exception):
+    """Raised by callers that want a non-2xx status to be an exception."""
+    def __init__(self, status: int, url: str, body: str = ""):
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+        self.url = url
+        self.body = body
+
+
+class Response:
+    __slots__ = ("status", "headers", "body", "url")
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes, url: str):
+        self.status = status
+        self.headers = headers  # lower-cased names
+        self.body = body
+        self.url = url
+
+    def text(self) -> str:
+        return self.body.decode("utf-8", errors="replace")
+
+
+def _decode_body(headers: Dict[str, str], data: bytes) -> bytes:
+    enc = (headers.get("content-encoding") or "").strip().lower()
+    if not data or enc not in ("gzip", "x-gzip", "deflate"):
+        return data
+    try:
+        if enc == "deflate":
+            try: out = zlib.decompress(data)
+            except zlib.error: out = zlib.decompress(data, -zlib.MAX_WBITS)  # raw deflate
+        else:
+            out = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    except zlib.error:
+        return data
+    headers.pop("content-encoding", None); headers.pop("content-length", None)
+    return out
+
+
+class ConnectionPool:
+    """Thread-safe pool of idle HTTP(S) connections keyed by (scheme, host, port).
+
+    At most `max_per_host` requests run against one host at once; further
+    callers wait for a slot (up to their timeout).
+    """
+
+    def __init__(self, max_idle_per_host: int = 8, max_per_host: int = 6):
+        self.max_idle_per_host = max_idle_per_host
+        self.max_per_host = max(1, int(max_per_host))
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._slots: Dict[Tuple[str, str, int], threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._ssl: Optional[ssl.SSLContext] = None
+
+    def _slot(self, key: Tuple[str, str, int]) -> threading.BoundedSemaphore:
+        with self._lock:
+            sem = self._slots.get(key)
+            if sem is None:
+                sem = self._slots[key] = threading.BoundedSemaphore(self.max_per_host)
+            return sem
+
+    def _context(self) -> ssl.SSLContext:
+        if self._ssl is None:
+            self._ssl = ssl.create_default_context()
+        return self._ssl
+
+    def _acquire(self, key: Tuple[str, str, int], timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            stack = self._idle.get(key)
+            if stack:
+                return stack.pop(), True
+        return self._connect(key, timeout), False
+
+    def _connect(self, key: Tuple[str, str, int], timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self._context())
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _release(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            stack = self._idle.setdefault(key, [])
+            if len(stack) < self.max_idle_per_host:
+                stack.append(conn); return
+        conn.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            conns = [c for stack in self._idle.values() for c in stack]
+            self._idle.clear()
+        for c in conns:
+            try: c.close()
+            except Exception: pass
+
+    def request(self, method: str, url: str, body: bytes | None = None,
+                headers: Dict[str, str] | None = None, timeout: float = 25) -> Response:
+        """Send one request and return the full response (any status code).
+
+        Follows redirects for GET/HEAD. Falls back to urllib when a proxy is
+        configured for the scheme, since http.client does not honour proxies.
+        Compressed bodies are decoded, so `Accept-Encoding: gzip` is safe to send.
+        """
+        hdrs = dict(headers or {})
+        for _ in range(5):
+            parts = urllib.parse.urlsplit(url)
+            scheme = (parts.scheme or "http").lower()
+            if urllib.request.getproxies().get(scheme):
+                return _urllib_request(method, url, body, hdrs, timeout)
+            port = parts.port or (443 if scheme == "https" else 80)
+            key = (scheme, parts.hostname or "", port)
+            path = parts.path or "/"
+            if parts.query:
+                path += "?" + parts.query
+            sem = self._slot(key)
+            if not sem.acquire(timeout=timeout):
+                raise RuntimeError(f"too many concurrent requests to {key[1]}")
+            try:
+                resp = self._send(key, method, path, body, hdrs, timeout, url)
+            finally:
+                sem.release()
+            loc = resp.headers.get("location")
+            if resp.status in _REDIRECTS and loc and method in ("GET", "HEAD"):
+                url = urllib.parse.urljoin(url, loc)
+                continue
+            return resp
+        raise urllib.error.URLError(f"too many redirects for {url}")
+
+    def _send(self, key, method, path, body, hdrs, timeout, url) -> Response:
+        # A pooled socket may have been closed by the server while idle; retry
+        # exactly once on a fresh connection in that case.
+        for attempt in (0, 1):
+            if attempt == 0:
+                conn, reused = self._acquire(key, timeout)
+            else:
+                conn, reused = self._connect(key, timeout), False
+            try:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                conn.request(method, path, body=body, headers=hdrs)
+                r = conn.getresponse()
+                data = r.read()
+            except (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise urllib.error.URLError(e)
+            except Exception:
+                conn.close()
+                raise
+            rh = {k.lower(): v for k, v in r.getheaders()}
+            resp = Response(r.status, rh, _decode_body(rh, data), url)
+            if r.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return resp
+        raise urllib.error.URLError("connection failed")
+
+
+def _urllib_request(method: str, url: str, body: bytes | None, headers: Dict[str, str], timeout: float) -> Response:
+    req = urllib.request.Request(url, data=body, method=method, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            rh = {k.lower(): v for k, v in resp.headers.items()}
+            return Response(resp.getcode() or 200, rh, _decode_body(rh, resp.read()), resp.geturl())
+    except urllib.error.HTTPError as e:
+        try: data = e.read()
+        except Exception: data = b""
+        rh = {k.lower(): v for k, v in (e.headers or {}).items()}
+        return Response(e.code, rh, _decode_body(rh, data), url)
+
+
+POOL = ConnectionPool()
+
+
+def request(method: str, url: str, body: bytes | None = None,
+            headers: Dict[str, str] | None = None, timeout: float = 25) -> Response:
+    return POOL.request(method, url, body=body, headers=headers, timeout=timeout)
@@ -14,7 +14,7 @@ def _addon_root() -> str:
 def _state_dir() -> str:
     # Try importing STATE_DIR from the add-on if available to keep log location consistent
     try:
-        from .__init__ import STATE_DIR  # type: ignore
+        from . import STATE_DIR  # type: ignore
         os.makedirs(STATE_DIR, exist_ok=True)
         return STATE_DIR
     except Exception:
@@ -49,7 +49,7 @@ _LEVELS = {"DEBUG":10, "INFO":20, "WARN":30, "ERROR":40}
 def _min_level() -> int:
     try:
         # Read from add-on config if available
-        from .__init__ import get_config  # type: ignore
+        from . import get_config  # type: ignore
         cfg = get_config() or {}
         lv = str(cfg.get("log_level", "INFO")).upper()
         return _LEVELS.get(lv, 20)
@@ -0,0 +1,208 @@
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Characters that count as "inside a word" for the glossary boundary rules.
+# Kept identical to the (?<![A-Za-z0-9]) / (?![A-Za-z0-9]) guards of the regex engine.
+_WORD_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789")
+
+# Edge keys pack (node, codepoint) into one int; codepoints fit in 21 bits.
+_SHIFT = 21
+
+
+def _fold(text: str) -> Tuple[str, Optional[List[int]]]:
+    """Lower-case text for matching. Returns (folded, offsets) where offsets maps
+    each folded char back to its index in `text`, or None when lengths agree."""
+    low = text.lower()
+    if len(low) == len(text):
+        return low, None
+    chars: List[str] = []; offsets: List[int] = []
+    for i, c in enumerate(text):
+        lc = c.lower()
+        chars.append(lc); offsets.extend([i] * len(lc))
+    return "".join(chars), offsets
+
+
+class SurfaceAutomaton:
+    """Aho-Corasick automaton over the lower-cased glossary surfaces.
+
+    Behaves like the big alternation regex it replaces: case-insensitive,
+    ASCII alphanumeric word boundaries on both sides, and leftmost-longest
+    non-overlapping matches. Scanning is linear in the card text regardless
+    of how many surfaces the glossary has.
+    """
+
+    __slots__ = ("_goto", "_fail", "_out", "_link", "_size")
+
+    def __init__(self, surfaces: Iterable[str]):
+        self._goto: Dict[int, int] = {}
+        self._fail: List[int] = [0]
+        self._out: List[Optional[str]] = [None]
+        self._link: List[int] = [0]
+        self._size = 0
+        children: List[List[Tuple[int, int]]] = [[]]
+        goto = self._goto
+        for s in surfaces:
+            key = (s or "").lower()
+            if not key: continue
+            node = 0
+            for ch in key:
+                edge = (node << _SHIFT) | ord(ch)
+                nxt = goto.get(edge)
+                if nxt is None:
+                    nxt = len(self._out)
+                    goto[edge] = nxt
+                    children[node].append((ord(ch), nxt))
+                    children.append([]); self._fail.append(0); self._out.append(None); self._link.append(0)
+                node = nxt
+            if self._out[node] is None:
+                self._out[node] = key; self._size += 1
+        self._build_links(children)
+
+    def _build_links(self, children: List[List[Tuple[int, int]]]) -> None:
+        goto, fail, out, link = self._goto, self._fail, self._out, self._link
+        queue = [child for _, child in children[0]]
+        head = 0
+        while head < len(queue):
+            node = queue[head]; head += 1
+            for o, child in children[node]:
+                f = fail[node]
+                while True:
+                    nxt = goto.get((f << _SHIFT) | o)
+                    if nxt is not None:
+                        fail[child] = nxt; break
+                    if f == 0:
+                        fail[child] = 0; break
+                    f = fail[f]
+                fc = fail[child]
+                link[child] = fc if out[fc] is not None else link[fc]
+                queue.append(child)
+
+    def __len__(self) -> int:
+        return self._size
+
+    # Explicit pickling support so the compiled automaton can live in the on-disk index cache
+    def __getstate__(self):
+        return (self._goto, self._fail, self._out, self._link, self._size)
+
+    def __setstate__(self, state) -> None:
+        self._goto, self._fail, self._out, self._link, self._size = state
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield (start, end, key) for each match in `text`, left to right.
+        `key` is the lower-cased surface as it appears in surface_claims."""
+        if not text or not self._size:
+            return
+        goto, fail, out, link = self._goto, self._fail, self._out, self._link
+        word = _WORD_CHARS
+        low, offsets = _fold(text)
+        n = len(text)
+        best: Dict[int, Tuple[int, str]] = {}
+        state = 0
+        for li, ch in enumerate(low):
+            o = ord(ch)
+            while True:
+                nxt = goto.get((state << _SHIFT) | o)
+                if nxt is not None:
+                    state = nxt; break
+                if state == 0:
+                    break
+                state = fail[state]
+            if state == 0:
+                continue
+            node = state if out[state] is not None else link[state]
+            if not node:
+                continue
+            end = (offsets[li] + 1) if offsets is not None else li + 1
+            if end < n and text[end] in word:
+                continue
+            while node:
+                key = out[node]
+                ls = li + 1 - len(key)
+                start = offsets[ls] if offsets is not None else ls
+                if start == 0 or text[start - 1] not in word:
+                    # Ends arrive in increasing order, so the last hit per start is the longest.
+                    best[start] = (end, key)
+                node = link[node]
+        last_end = 0
+        for start in sorted(best):
+            if start < last_end:
+                continue
+            end, key = best[start]
+            last_end = end
+            yield start, end, key
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """True when the Levenshtein distance between a and b is at most 1."""
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    i = 0
+    while i < la and a[i] == b[i]:
+        i += 1
+    if i == la:
+        return True
+    if la == lb:
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+
+class FuzzyIndex:
+    """Deletion-neighbourhood (SymSpell-style) table for distance-1 lookups.
+
+    Every surface is stored under itself and each single-character deletion
+    of itself; a query probes the token and its own deletions, so candidates
+    come from a handful of hash lookups instead of a scan. Hits are verified
+    with an exact distance check and returned in build order (shorter
+    surfaces first), which is the order the old linear scan produced.
+    """
+
+    __slots__ = ("_table", "_rank")
+
+    def __init__(self, surfaces: Iterable[str]):
+        self._table: Dict[str, List[str]] = {}
+        self._rank: Dict[str, int] = {}
+        for s in surfaces:
+            if not s or s in self._rank:
+                continue
+            self._rank[s] = len(self._rank)
+            for key in self._probes(s):
+                bucket = self._table.setdefault(key, [])
+                if not bucket or bucket[-1] != s:
+                    bucket.append(s)
+
+    @staticmethod
+    def _probes(s: str) -> List[str]:
+        out = [s]
+        seen = {s}
+        for i in range(len(s)):
+            d = s[:i] + s[i + 1:]
+            if d not in seen:
+                seen.add(d); out.append(d)
+        return out
+
+    def __len__(self) -> int:
+        return len(self._rank)
+
+    def __getstate__(self):
+        return (self._table, self._rank)
+
+    def __setstate__(self, state) -> None:
+        self._table, self._rank = state
+
+    def lookup(self, token: str) -> List[str]:
+        """Surfaces within one edit of `token` that share its first character."""
+        if not token:
+            return []
+        table = self._table
+        hits = set()
+        for key in self._probes(token):
+            bucket = table.get(key)
+            if bucket:
+                hits.update(bucket)
+        first = token[0]
+        out = [s for s in hits if s[0] == first and within_one_edit(token, s)]
+        out.sort(key=self._rank.__getitem__)
+        return out
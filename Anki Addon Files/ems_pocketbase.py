@@ -1,6 +1,6 @@
 from __future__ import annotations
-import json, os, time, urllib.request, urllib.error, socket
-from typing import Dict, Any, Tuple, Optional
+import atexit, http.client, json, os, time, urllib.error, socket
+from typing import Callable, Dict, Any, List, Tuple, Optional
 from . import ems_logging as LOG
 import threading
 from datetime import datetime
@@ -8,160 +8,190 @@ from datetime import datetime
 # These are imported lazily inside functions to avoid import cycles
 
 _RATING_CACHE: Dict[str, Dict[str, Any]] = {}
+_RATING_TTL_S = 180  # 3 minutes
 _TERM_ID_CACHE: Dict[str, str] = {}
+_PREFETCH_LOCK = threading.Lock()
+_PREFETCH_INFLIGHT: set = set()
+_RATING_GEN: Dict[str, int] = {}  # bumped by rating_set; fetches started before it must not cache
 
-def _state_paths():
-    from .__init__ import STATE_DIR
-    os.makedirs(STATE_DIR, exist_ok=True)
-    return os.path.join(STATE_DIR, "pb_auth.json")
+# ---------------- Local state (auth, offline, hooks, tamagotchi meta) ----------------
 
-def _offline_path() -> str:
-    from .__init__ import STATE_DIR
-    os.makedirs(STATE_DIR, exist_ok=True)
-    return os.path.join(STATE_DIR, "offline_state.json")
+_FLUSH_DELAY_S = 0.5
+
+class _StateFile:
+    """In-memory copy of one JSON file under STATE_DIR, shared by all threads.
+
+    The file is read once; later reads are served from memory. Changes apply
+    to memory at once and reach disk in one batched write shortly after
+    (or immediately with sync=True). Hold `lock` for read-modify-write.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.RLock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+
+    def _path(self) -> str:
+        from . import STATE_DIR
+        os.makedirs(STATE_DIR, exist_ok=True)
+        return os.path.join(STATE_DIR, self.name)
+
+    def _loaded(self) -> Dict[str, Any]:
+        if self._data is None:
+            try:
+                p = self._path()
+                self._data = (json.load(open(p, "r", encoding="utf-8")) or {}) if os.path.exists(p) else {}
+            except Exception:
+                self._data = {}
+        return self._data
+
+    def get(self) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self._loaded())
+
+    def peek(self, key: str, default: Any = None) -> Any:
+        with self.lock:
+            return self._loaded().get(key, default)
+
+    def update(self, changes: Dict[str, Any], persist: bool = True, sync: bool = False) -> None:
+        with self.lock:
+            self._loaded().update(changes)
+            if persist: self._mark_dirty(sync)
+
+    def replace(self, obj: Dict[str, Any], sync: bool = False) -> None:
+        with self.lock:
+            self._data = dict(obj or {})
+            self._mark_dirty(sync)
+
+    def clear(self) -> None:
+        with self.lock:
+            self._data = {}; self._dirty = False
+            if self._timer is not None:
+                self._timer.cancel(); self._timer = None
+            try:
+                p = self._path()
+                if os.path.exists(p): os.remove(p)
+            except Exception:
+                pass
+
+    def _mark_dirty(self, sync: bool) -> None:
+        self._dirty = True
+        if sync:
+            self.flush()
+        elif self._timer is None:
+            self._timer = threading.Timer(_FLUSH_DELAY_S, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> None:
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel(); self._timer = None
+            if not self._dirty or self._data is None:
+                return
+            try:
+                p = self._path(); tmp = p + ".part"
+                with open(tmp, "w", encoding="utf-8") as fh:
+                    json.dump(self._data, fh, ensure_ascii=False, indent=2)
+                os.replace(tmp, p)
+                self._dirty = False
+            except Exception:
+                pass
+
+_AUTH = _StateFile("pb_auth.json")
+_OFFLINE = _StateFile("offline_state.json")
+_TAMA_META = _StateFile("tamagotchi_pb_meta.json")  # remote record id for tamagotchi state
+_HOOKS = _StateFile("pb_hooks.json")
+
+def flush_state() -> None:
+    """Write any pending local state changes to disk now."""
+    for f in (_AUTH, _OFFLINE, _TAMA_META, _HOOKS):
+        f.flush()
+
+atexit.register(flush_state)
 
 def _read_offline_state() -> Dict[str, Any]:
-    try:
-        p = _offline_path()
-        if os.path.exists(p):
-            return json.load(open(p, "r", encoding="utf-8")) or {}
-    except Exception:
-        pass
-    return {}
+    return _OFFLINE.get()
 
 def _write_offline_state(obj: Dict[str, Any]) -> None:
-    try:
-        p = _offline_path()
-        with open(p, "w", encoding="utf-8") as fh:
-            json.dump(obj, fh, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+    _OFFLINE.replace(obj)
 
-def _mark_connect_fail(reason: str) -> None:
+def _mark_connect_fail(reason: str) -> Dict[str, Any]:
     """Track transient failures without immediately forcing offline.
 
     We only flip to offline after 2 consecutive connectivity errors
     to avoid false positives from 404s or hook route misses.
+    Returns the offline state after the update.
     """
-    try:
-        st = _read_offline_state() or {}
-        fails = int(st.get("fails", 0) or 0) + 1
-        st["fails"] = fails
-        st["last_err"] = reason
-        _write_offline_state(st)
-    except Exception:
-        pass
+    with _OFFLINE.lock:
+        fails = int(_OFFLINE.peek("fails", 0) or 0) + 1
+        _OFFLINE.update({"fails": fails, "last_err": reason})
+        return _OFFLINE.get()
 
 def _reset_connect_fail() -> None:
-    try:
-        st = _read_offline_state() or {}
-        changed = False
-        if st.get("fails"):
-            st["fails"] = 0; changed = True
-        # track last successful time to avoid flap
-        st["last_ok_ts"] = int(time.time())
-        if changed or ("last_ok_ts" not in st):
-            _write_offline_state(st)
-    except Exception:
-        pass
+    with _OFFLINE.lock:
+        changed = bool(_OFFLINE.peek("fails"))
+        # track last successful time to avoid flap; only a cleared failure count is worth a write
+        _OFFLINE.update({"fails": 0, "last_ok_ts": int(time.time())} if changed else {"last_ok_ts": int(time.time())}, persist=changed)
 
 def _is_connectivity_error(e: Exception) -> bool:
     if isinstance(e, urllib.error.URLError):
         return True
     if isinstance(e, (TimeoutError, ConnectionRefusedError, ConnectionResetError, socket.gaierror, socket.timeout)):
         return True
+    # urllib wrapped socket/TLS failures in URLError; the pooled client surfaces them directly
+    if isinstance(e, (OSError, http.client.HTTPException)):
+        return True
     s = (str(e) or "").lower()
     for kw in ("timed out", "connection refused", "offline", "failed to establish", "name resolution", "getaddrinfo", "remote end closed"):
         if kw in s:
             return True
     return False
 
-def _tama_meta_path() -> str:
-    # Where we persist the remote record id for tamagotchi state
-    from .__init__ import STATE_DIR
-    os.makedirs(STATE_DIR, exist_ok=True)
-    return os.path.join(STATE_DIR, "tamagotchi_pb_meta.json")
-
-def _hooks_state_path() -> str:
-    from .__init__ import STATE_DIR
-    os.makedirs(STATE_DIR, exist_ok=True)
-    return os.path.join(STATE_DIR, "pb_hooks.json")
-
 def _load_hooks_state() -> Dict[str, Any]:
-    try:
-        p = _hooks_state_path()
-        if os.path.exists(p):
-            return json.load(open(p, "r", encoding="utf-8")) or {}
-    except Exception:
-        pass
-    return {}
+    return _HOOKS.get()
 
 def _save_hooks_state(data: Dict[str, Any]) -> None:
-    try:
-        p = _hooks_state_path()
-        cur = _load_hooks_state()
-        cur.update(data)
-        json.dump(cur, open(p, "w", encoding="utf-8"), ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+    _HOOKS.update(data)
 
 def _load_tama_meta() -> Dict[str, Any]:
-    try:
-        p = _tama_meta_path()
-        if os.path.exists(p):
-            return json.load(open(p, "r", encoding="utf-8")) or {}
-    except Exception:
-        pass
-    return {}
+    return _TAMA_META.get()
 
 def _save_tama_meta(meta: Dict[str, Any]) -> None:
-    try:
-        p = _tama_meta_path()
-        with open(p, "w", encoding="utf-8") as fh:
-            json.dump(meta, fh, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+    _TAMA_META.replace(meta)
 
 def load_auth() -> Dict[str, Any]:
-    try:
-        p = _state_paths()
-        if os.path.exists(p):
-            return json.load(open(p, "r", encoding="utf-8")) or {}
-    except Exception:
-        pass
-    return {}
+    return _AUTH.get()
 
 def save_auth(data: Dict[str, Any]) -> None:
-    try:
-        p = _state_paths()
-        with open(p, "w", encoding="utf-8") as fh:
-            json.dump(data, fh, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+    # Written through at once: losing a fresh login to a crash is not acceptable
+    _AUTH.replace(data, sync=True)
 
 def clear_auth() -> None:
-    try:
-        p = _state_paths()
-        if os.path.exists(p):
-            os.remove(p)
-    except Exception:
-        pass
+    _AUTH.clear()
 
 # ---------------- Offline mode management ----------------
 
 def is_offline() -> bool:
-    st = _read_offline_state() or {}
-    return bool(st.get("offline"))
+    return bool(_OFFLINE.peek("offline"))
+
+def offline_reason() -> str:
+    return str(_OFFLINE.peek("reason") or "")
+
+def live_flags() -> Dict[str, bool]:
+    """Connectivity and login flags for the UI, served from memory."""
+    return {"offline": is_offline(), "loggedIn": bool(_AUTH.peek("token"))}
 
 def _notify_offline_once(msg: str) -> None:
     # Debounce notifications to at most once per session window
-    st = _read_offline_state() or {}
-    last_note = int(st.get("last_notify", 0) or 0)
     now = int(time.time())
-    if now - last_note < 30:
-        return
-    st["last_notify"] = now
-    _write_offline_state(st)
+    with _OFFLINE.lock:
+        last_note = int(_OFFLINE.peek("last_notify", 0) or 0)
+        if now - last_note < 30:
+            return
+        _OFFLINE.update({"last_notify": now})
     try:
         from aqt import mw
         from aqt.utils import tooltip
@@ -178,13 +208,14 @@ def _notify_offline_once(msg: str) -> None:
         pass
 
 def set_offline(on: bool, reason: str = "") -> None:
-    st = _read_offline_state() or {}
-    prev = bool(st.get("offline"))
-    st["offline"] = bool(on)
-    st["ts"] = int(time.time())
-    if reason:
-        st["reason"] = str(reason)
-    _write_offline_state(st)
+    with _OFFLINE.lock:
+        prev = bool(_OFFLINE.peek("offline"))
+        changes = {"offline": bool(on), "ts": int(time.time())}
+        if reason:
+            changes["reason"] = str(reason)
+        _OFFLINE.update(changes)
+    if bool(on) != prev:
+        _publish_connectivity(bool(on))
     if on and not prev:
         try:
             from . import ems_logging as LOG
@@ -223,7 +254,7 @@ def ping(base_url: Optional[str] = None, timeout: int = 5) -> bool:
     base = (base_url or _base_url_from_auth() or "").rstrip("/")
     if not base:
         try:
-            from .__init__ import get_config
+            from . import get_config
             cfg = get_config() or {}
             base = (cfg.get("pb_base_url") or "").strip().rstrip("/")
         except Exception:
@@ -239,22 +270,82 @@ def ping(base_url: Optional[str] = None, timeout: int = 5) -> bool:
         return False
 
 def try_reconnect(background: bool = True) -> None:
-    """Attempt to go back online by pinging the server. No-op if already online."""
-    def _run():
+    """Attempt to go back online by pinging the server. No-op if already online.
+
+    In the background this wakes the connectivity monitor for an immediate probe.
+    """
+    if not is_offline():
+        return
+    if background:
+        _ensure_monitor(probe_now=True)
+        return
+    try:
+        if ping():
+            set_offline(False)
+            LOG.log("pb.reconnect.ok")
+    except Exception:
+        pass
+
+# ---------------- Connectivity monitor ----------------
+# While offline a single thread probes /api/health with exponential backoff;
+# state changes are published in memory to subscribers (menu, webviews).
+HEALTH_BACKOFF_START_S = 5.0
+HEALTH_BACKOFF_MAX_S = 300.0
+
+_MONITOR_LOCK = threading.Lock()
+_MONITOR_WAKE = threading.Event()
+_monitor: Optional[threading.Thread] = None
+_subscribers: List[Callable[[bool], None]] = []
+
+def subscribe_connectivity(callback: Callable[[bool], None]) -> None:
+    """Call `callback(offline)` on every online/offline change (from the detecting thread)."""
+    with _MONITOR_LOCK:
+        if callback not in _subscribers:
+            _subscribers.append(callback)
+
+def unsubscribe_connectivity(callback: Callable[[bool], None]) -> None:
+    with _MONITOR_LOCK:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+def _publish_connectivity(offline: bool) -> None:
+    with _MONITOR_LOCK:
+        subs = list(_subscribers)
+    for cb in subs:
         try:
-            if ping():
+            cb(offline)
+        except Exception as e:
+            LOG.log("pb.connectivity.subscriber_error", error=str(e))
+    if offline:
+        _ensure_monitor()
+
+def _ensure_monitor(probe_now: bool = False) -> None:
+    global _monitor
+    with _MONITOR_LOCK:
+        if _monitor is None or not _monitor.is_alive():
+            _monitor = threading.Thread(target=_monitor_loop, daemon=True, name="ems-pb-health")
+            _monitor.start()
+    if probe_now:
+        _MONITOR_WAKE.set()
+
+def _monitor_loop() -> None:
+    global _monitor
+    delay = HEALTH_BACKOFF_START_S
+    while True:
+        _MONITOR_WAKE.wait(delay)
+        woken = _MONITOR_WAKE.is_set(); _MONITOR_WAKE.clear()
+        if is_offline():
+            # ping bypasses the offline short-circuit; a 200 flips us online via _req
+            if ping(timeout=5):
                 set_offline(False)
-                try:
-                    from . import ems_logging as LOG
-                    LOG.log("pb.reconnect.ok")
-                except Exception:
-                    pass
-        except Exception:
-            pass
-    if background:
-        threading.Thread(target=_run, daemon=True).start()
-    else:
-        _run()
+                LOG.log("pb.reconnect.ok", via="monitor")
+            else:
+                delay = HEALTH_BACKOFF_START_S if woken else min(HEALTH_BACKOFF_MAX_S, delay * 2)
+                LOG.log("pb.health.fail", next_s=delay)
+        with _MONITOR_LOCK:
+            if not is_offline():
+                _monitor = None
+                return
 
 def _req(url: str, method: str = "GET", body: Dict[str, Any] | None = None, headers: Dict[str, str] | None = None, timeout: int = 12, ignore_offline: bool = False) -> Tuple[int, str]:
     t0 = time.time()
@@ -284,9 +375,8 @@ def _req(url: str, method: str = "GET", body: Dict[str, Any] | None = None, head
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36 EMSAnki/1.0",
         # Expect JSON responses from the PB API
         "Accept": "application/json, text/plain, */*",
-        # Avoid compressed encodings we may not transparently decode
-        # (urllib handles gzip but not brotli in some builds). Let server choose.
-        # Intentionally omit Accept-Encoding.
+        # ems_http decodes gzip/deflate; brotli is deliberately not offered
+        "Accept-Encoding": "gzip, deflate",
         "Accept-Language": "en-US,en;q=0.9",
     }
     if origin:
@@ -303,33 +393,27 @@ def _req(url: str, method: str = "GET", body: Dict[str, Any] | None = None, head
             return 0, "offline"
     except Exception:
         pass
-    req = urllib.request.Request(url, data=data, method=method, headers=hdrs)
+    # Shared keep-alive pool: repeated calls to pb_base_url reuse one TLS connection
+    from . import ems_http as HTTP
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            txt = resp.read().decode("utf-8", errors="replace")
-            # Successful response implies connectivity; clear offline if previously set
-            try:
-                if is_offline():
-                    set_offline(False)
-            except Exception:
-                pass
-            _reset_connect_fail()
-            return resp.getcode() or 200, txt
-    except urllib.error.HTTPError as e:
+        resp = HTTP.request(method, url, body=data, headers=hdrs, timeout=timeout)
+        txt = resp.text()
+        if not (200 <= resp.status < 300):
+            return resp.status, txt
+        # Successful response implies connectivity; clear offline if previously set
         try:
-            txt = e.read().decode("utf-8", errors="replace")
+            if is_offline():
+                set_offline(False)
         except Exception:
-            txt = str(e)
-        return e.code, txt
+            pass
+        _reset_connect_fail()
+        return resp.status, txt
     except Exception as e:
         # Only flip to offline on connectivity-type errors. Other exceptions
         # (e.g., JSON/ValueError) should not drop the user offline.
         if _is_connectivity_error(e):
             # Flip to offline only after >=3 consecutive connectivity errors
-            st = _read_offline_state() or {}
-            fails_before = int(st.get("fails", 0) or 0)
-            _mark_connect_fail(f"{type(e).__name__}: {e} @ {url}")
-            st2 = _read_offline_state() or {}
+            st2 = _mark_connect_fail(f"{type(e).__name__}: {e} @ {url}")
             fails_now = int(st2.get("fails", 0) or 0)
             last_ok = int(st2.get("last_ok_ts", 0) or 0)
             # Add a small protection window: don't flip within 5s of a successful call
@@ -504,7 +588,7 @@ def seed_terms_all() -> Tuple[bool, str]:
 def _cfg() -> Dict[str, Any]:
     """Read add-on config and provide defaults for tamagotchi-related keys."""
     try:
-        from .__init__ import get_config
+        from . import get_config
         cfg = get_config() or {}
     except Exception:
         cfg = {}
@@ -560,6 +644,7 @@ def tamagotchi_fetch() -> Tuple[bool, Optional[Dict[str, Any]], float, Optional[
                 data_field = cfg.get("pb_tamagotchi_data_field", "data")
                 updated = obj.get("updated") or obj.get("updatedAt") or ""
                 state = obj.get(data_field) or {}
+                _save_tama_meta({"record_id": obj.get("id") or rid, "rev": _tama_server_rev(state)})
                 try:
                     LOG.log("tama.fetch.ok", via="id", updated=updated)
                 except Exception:
@@ -585,9 +670,9 @@ def tamagotchi_fetch() -> Tuple[bool, Optional[Dict[str, Any]], float, Optional[
         data_field = cfg.get("pb_tamagotchi_data_field", "data")
         updated = rec.get("updated") or rec.get("updatedAt") or ""
         rid = rec.get("id")
-        if rid:
-            _save_tama_meta({"record_id": rid})
         state = rec.get(data_field) or {}
+        if rid:
+            _save_tama_meta({"record_id": rid, "rev": _tama_server_rev(state)})
         try:
             LOG.log("tama.fetch.ok", via="query", updated=updated)
         except Exception:
@@ -596,11 +681,27 @@ def tamagotchi_fetch() -> Tuple[bool, Optional[Dict[str, Any]], float, Optional[
     except Exception as e:
         return False, None, 0.0, None, f"Bad response: {e}"
 
+_TAMA_UPSERT_LOCK = threading.Lock()
+
+def _tama_server_rev(state: Any) -> int:
+    # Server-assigned revision (data.rev, bumped by the tamagotchi hook on every write)
+    try:
+        return int((state or {}).get("rev") or 0)
+    except Exception:
+        return 0
+
 def tamagotchi_upsert(state: Dict[str, Any]) -> Tuple[bool, str, Optional[str]]:
     """Create or update the user's Tamagotchi record with the given state dict.
 
+    Only one upsert runs at a time, so writes reach the server in order. The
+    state carries the last server rev seen; the server refuses it (409) when
+    the stored state is newer, which is reported as ok with "Server newer".
     Returns (ok, message, record_id)
     """
+    with _TAMA_UPSERT_LOCK:
+        return _tamagotchi_upsert(state)
+
+def _tamagotchi_upsert(state: Dict[str, Any]) -> Tuple[bool, str, Optional[str]]:
     base_token = _auth_headers()
     if not base_token[0]:
         return False, "Not logged in", None
@@ -614,29 +715,40 @@ def tamagotchi_upsert(state: Dict[str, Any]) -> Tuple[bool, str, Optional[str]]:
     if not user_id:
         return False, "No user id", None
 
-    meta = _load_tama_meta() or {}
-    rid = meta.get("record_id")
-
-    # PATCH existing record if we have an id
-    body = {data_field: state}
-    if rid:
+    def _patch(rid: str) -> Tuple[int, str]:
+        body = {data_field: dict(state, rev=_tama_server_rev(_load_tama_meta()))}
         url = f"{base.rstrip('/')}/api/collections/{collection}/records/{rid}"
         code, txt = _req(url, method="PATCH", body=body, headers=headers)
+        if code == 200:
+            try:
+                obj = json.loads(txt) or {}
+                _save_tama_meta({"record_id": rid, "rev": _tama_server_rev(obj.get(data_field))})
+            except Exception:
+                pass
+        return code, txt
+
+    # PATCH the known record; look it up only when that id is gone
+    rid = (_load_tama_meta() or {}).get("record_id")
+    if rid:
+        code, txt = _patch(rid)
         if code == 200:
             return True, "Updated", rid
-        # Fall back to create if missing
+        if code == 409:
+            return True, "Server newer", rid
+        if code != 404:
+            return False, f"HTTP {code}: {txt[:200]}", rid
 
-    # Try to find an existing record by user relation first (to avoid duplicates)
+    # Find an existing record by user relation first (to avoid duplicates)
     ok, _state, _ts, found_id, _msg = tamagotchi_fetch()
     if ok and found_id:
-        url = f"{base.rstrip('/')}/api/collections/{collection}/records/{found_id}"
-        code, txt = _req(url, method="PATCH", body=body, headers=headers)
+        code, txt = _patch(found_id)
         if code == 200:
-            _save_tama_meta({"record_id": found_id})
             return True, "Updated", found_id
+        if code == 409:
+            return True, "Server newer", found_id
 
-    # Create new record
-    body_create = {user_field: user_id, data_field: state}
+    # Create new record (the unique user index rejects a duplicate)
+    body_create = {user_field: user_id, data_field: dict(state, rev=0)}
     url = f"{base.rstrip('/')}/api/collections/{collection}/records"
     code, txt = _req(url, method="POST", body=body_create, headers=headers)
     if code == 200 or code == 201:
@@ -644,20 +756,106 @@ def tamagotchi_upsert(state: Dict[str, Any]) -> Tuple[bool, str, Optional[str]]:
             obj = json.loads(txt) or {}
             new_id = obj.get("id")
             if new_id:
-                _save_tama_meta({"record_id": new_id})
+                _save_tama_meta({"record_id": new_id, "rev": _tama_server_rev(obj.get(data_field))})
             return True, "Created", new_id
         except Exception:
             return True, "Created", None
     return False, f"HTTP {code}: {txt[:200]}", None
 
-def tamagotchi_push_async(state: Dict[str, Any]) -> None:
-    """Push state in a background thread; no UI feedback, best-effort."""
-    def _run():
+# Background push worker: state changes are coalesced and only the newest is
+# sent, at most one request in flight and at most one push per
+# TAMA_PUSH_INTERVAL_S, backing off while offline.
+TAMA_PUSH_DEBOUNCE_S = 2.0
+TAMA_PUSH_INTERVAL_S = 20.0
+TAMA_PUSH_BACKOFF_MAX_S = 300.0
+
+_TAMA_PUSH = threading.Condition()
+_tama_pending: Optional[Dict[str, Any]] = None
+_tama_pending_since = 0.0
+_tama_rev = 0           # bumped on every queued state
+_tama_sent_rev = 0      # newest rev the server has accepted
+_tama_done_rev = 0      # newest rev a push attempt has finished for
+_tama_last_msg = ""
+_tama_last_push = 0.0
+_tama_backoff = 0.0
+_tama_worker: Optional[threading.Thread] = None
+
+def tamagotchi_push_async(state: Dict[str, Any]) -> int:
+    """Queue state for the background push worker; best-effort. Returns its queue rev."""
+    global _tama_pending, _tama_pending_since, _tama_rev, _tama_worker
+    with _TAMA_PUSH:
+        if _tama_pending is None:
+            _tama_pending_since = time.time()
+        _tama_pending = dict(state or {})
+        _tama_rev += 1
+        if _tama_worker is None or not _tama_worker.is_alive():
+            _tama_worker = threading.Thread(target=_tama_push_loop, daemon=True, name="ems-tama-push")
+            _tama_worker.start()
+        _TAMA_PUSH.notify_all()
+        return _tama_rev
+
+def tamagotchi_push_now(wait_s: float = 0.0) -> Tuple[bool, str]:
+    """Send any queued state without waiting for the push interval.
+
+    With wait_s, block up to that long until the newest queued state has been
+    attempted; only for background threads (manual sync). Returns (ok, message).
+    """
+    global _tama_pending_since, _tama_last_push, _tama_backoff
+    with _TAMA_PUSH:
+        target = _tama_rev
+        if _tama_pending is not None:
+            _tama_pending_since = _tama_last_push = _tama_backoff = 0.0
+            _TAMA_PUSH.notify_all()
+        deadline = time.time() + max(0.0, wait_s)
+        while _tama_done_rev < target:
+            left = deadline - time.time()
+            if left <= 0:
+                return False, "Push still pending"
+            _TAMA_PUSH.wait(left)
+        if _tama_sent_rev >= target:
+            return True, "OK"
+        return False, _tama_last_msg or "Push failed"
+
+def _tama_push_loop() -> None:
+    global _tama_pending, _tama_pending_since, _tama_sent_rev, _tama_done_rev, _tama_last_msg
+    global _tama_last_push, _tama_backoff, _tama_worker
+    while True:
+        with _TAMA_PUSH:
+            while True:
+                if _tama_pending is None:
+                    # Idle workers exit; the next push starts a fresh one
+                    if not _TAMA_PUSH.wait(60) and _tama_pending is None:
+                        _tama_worker = None
+                        return
+                    continue
+                due = max(_tama_pending_since + TAMA_PUSH_DEBOUNCE_S,
+                          _tama_last_push + max(TAMA_PUSH_INTERVAL_S, _tama_backoff))
+                wait = due - time.time()
+                if wait <= 0:
+                    break
+                _TAMA_PUSH.wait(wait)
+            state, rev = _tama_pending, _tama_rev
+            _tama_pending = None
+        ok = False; msg = "offline"
+        if not is_offline():
+            try:
+                ok, msg, _rid = tamagotchi_upsert(state)
+            except Exception as e:
+                msg = str(e)
+        with _TAMA_PUSH:
+            _tama_last_push = time.time()
+            _tama_done_rev = max(_tama_done_rev, rev); _tama_last_msg = msg
+            if ok:
+                _tama_sent_rev = max(_tama_sent_rev, rev); _tama_backoff = 0.0
+            elif msg != "Not logged in" and _tama_pending is None and rev > _tama_sent_rev:
+                # Retry the same state later unless a newer one was queued meanwhile
+                _tama_pending = state; _tama_pending_since = _tama_last_push
+                _tama_backoff = min(TAMA_PUSH_BACKOFF_MAX_S, max(TAMA_PUSH_INTERVAL_S, _tama_backoff * 2))
+            _TAMA_PUSH.notify_all()
         try:
-            tamagotchi_upsert(state)
+            LOG.log("tama.push", ok=bool(ok), rev=rev, msg=msg, backoff=_tama_backoff)
         except Exception:
             pass
-    threading.Thread(target=_run, daemon=True).start()
 
 # ---------------- Glossary (ratings, credits, profiles) ----------------
 
@@ -713,8 +911,8 @@ def _ensure_term_record(slug: str, title: str | None = None) -> Optional[str]:
         # try to enrich title from local glossary
         if not title:
             try:
-                from .__init__ import GLOSSARY  # type: ignore
-                t = (getattr(GLOSSARY, 'terms_by_id', {}) or {}).get(slug) or {}
+                from . import GLOSSARY  # type: ignore
+                t = (getattr(GLOSSARY, 'term_meta', {}) or {}).get(slug) or {}
                 names = t.get('names') or []
                 if names:
                     title = names[0]
@@ -746,19 +944,163 @@ def _ensure_term_record(slug: str, title: str | None = None) -> Optional[str]:
         pass
     return None
 
-def rating_get(slug: str) -> Tuple[bool, Dict[str, Any]]:
-    # Short TTL cache to avoid repeated network calls on frequent opens
+def rating_cached(slug: str) -> Optional[Dict[str, Any]]:
+    """Rating summary for `slug` if one was fetched within the last few minutes."""
     try:
         ent = _RATING_CACHE.get(slug)
-        if ent:
-            ts = float(ent.get("ts") or 0)
-            if (time.time() - ts) < 180:  # 3 minutes
-                data = ent.get("data") or {}
-                return True, dict(data)
+        if ent and (time.time() - float(ent.get("ts") or 0)) < _RATING_TTL_S:
+            return dict(ent.get("data") or {})
     except Exception:
         pass
+    return None
+
+def rating_get(slug: str) -> Tuple[bool, Dict[str, Any]]:
+    # Short TTL cache to avoid repeated network calls on frequent opens
+    data = rating_cached(slug)
+    if data is not None:
+        return True, data
+    gen = _RATING_GEN.get(slug, 0)
     base, headers = _base_headers()
     if not base: return False, {"error": "Not logged in"}
+    res = _rating_summary(base, headers, slug)
+    if res is None:
+        ok, res = _rating_from_rows(base, headers, slug)
+        if not ok: return False, res
+    try:
+        LOG.log("rating.get", id=slug, avg=res.get("avg"), count=res.get("count"), mine=res.get("mine"))
+    except Exception:
+        pass
+    try:
+        with _PREFETCH_LOCK:
+            if _RATING_GEN.get(slug, 0) == gen:
+                _RATING_CACHE[slug] = {"ts": time.time(), "data": res}
+    except Exception:
+        pass
+    return True, res
+
+_HOOK_RETRY_S = 24 * 3600  # re-probe a hook route that was missing after this long
+
+def _hook_missing(name: str) -> bool:
+    hooks = _load_hooks_state()
+    return hooks.get(name) is False and (time.time() - float(hooks.get(name + "_ts") or 0)) < _HOOK_RETRY_S
+
+def _mark_hook_missing(name: str) -> None:
+    _save_hooks_state({name: False, name + "_ts": int(time.time())})
+
+def _rating_result(slug: str, obj: Dict[str, Any]) -> Dict[str, Any]:
+    # Normalise one hook-route summary and remember the term record id it carries
+    tid = obj.get("termId")
+    if tid:
+        _TERM_ID_CACHE[slug] = tid
+    mine = obj.get("mine")
+    return {"avg": float(obj.get("avg") or 0.0), "count": int(obj.get("count") or 0),
+            "mine": int(mine) if mine else None, "termId": tid, "ratingId": obj.get("ratingId")}
+
+def _rating_summary(base: str, headers: Dict[str, str], slug: str) -> Optional[Dict[str, Any]]:
+    """avg, count and mine for a term in one call via the /ems/rating-summary hook route.
+
+    Returns None when the route is unavailable, so callers fall back to listing rows.
+    """
+    if _hook_missing("rating_summary"):
+        return None
+    from urllib.parse import quote
+    code, txt = _req(f"{base.rstrip('/')}/ems/rating-summary?slug=" + quote(slug), headers=headers)
+    if code == 404:
+        _mark_hook_missing("rating_summary"); return None
+    if code != 200:
+        return None
+    try:
+        obj = json.loads(txt) or {}
+        return _rating_result(slug, obj) if obj.get("ok") else None
+    except Exception:
+        return None
+
+def rating_prefetch(slugs) -> int:
+    """Fill _RATING_CACHE for every slug without a fresh summary, in one request.
+
+    Uses the /ems/rating-summaries hook route; without it nothing is fetched and
+    popups load their rating on open as before. Returns how many were cached.
+    """
+    base, headers = _base_headers()
+    if not base or is_offline() or _hook_missing("rating_summaries"):
+        return 0
+    with _PREFETCH_LOCK:
+        want = [s for s in dict.fromkeys(slugs or []) if s and s not in _PREFETCH_INFLIGHT and rating_cached(s) is None][:200]
+        _PREFETCH_INFLIGHT.update(want)
+        gens = {s: _RATING_GEN.get(s, 0) for s in want}
+    if not want:
+        return 0
+    t0 = time.time(); n = 0
+    try:
+        code, txt = _req(f"{base.rstrip('/')}/ems/rating-summaries", method="POST", body={"slugs": want}, headers=headers)
+        if code == 404:
+            _mark_hook_missing("rating_summaries"); return 0
+        if code != 200:
+            return 0
+        items = (json.loads(txt) or {}).get("items") or {}
+        for slug in want:
+            it = items.get(slug)
+            if not isinstance(it, dict):
+                continue
+            res = _rating_result(slug, it)
+            with _PREFETCH_LOCK:
+                # Skip slugs rated since the request went out, or fetched fresher meanwhile
+                if _RATING_GEN.get(slug, 0) != gens[slug] or float((_RATING_CACHE.get(slug) or {}).get("ts") or 0) >= t0:
+                    continue
+                _RATING_CACHE[slug] = {"ts": time.time(), "data": res}; n += 1
+        LOG.log("rating.prefetch", asked=len(want), cached=n, ms=round((time.time() - t0) * 1000, 1))
+    except Exception as e:
+        try: LOG.log("rating.prefetch.error", error=str(e))
+        except Exception: pass
+    finally:
+        with _PREFETCH_LOCK:
+            _PREFETCH_INFLIGHT.difference_update(want)
+    return n
+
+# One background worker serves every card's prefetch: term ids queued while a
+# request is in flight are merged into the next one.
+_PREFETCH_QUEUE = threading.Condition()
+_prefetch_pending: Dict[str, None] = {}
+_prefetch_worker: Optional[threading.Thread] = None
+
+def rating_prefetch_async(slugs) -> None:
+    """Queue slugs for the prefetch worker; skipped while offline or logged out."""
+    global _prefetch_worker
+    flags = live_flags()
+    if flags["offline"] or not flags["loggedIn"]:
+        return
+    with _PREFETCH_QUEUE:
+        for s in slugs or []:
+            if s and rating_cached(s) is None:
+                _prefetch_pending[s] = None
+        if not _prefetch_pending:
+            return
+        if _prefetch_worker is None or not _prefetch_worker.is_alive():
+            _prefetch_worker = threading.Thread(target=_prefetch_loop, daemon=True, name="ems-rating-prefetch")
+            _prefetch_worker.start()
+        _PREFETCH_QUEUE.notify()
+
+def _prefetch_loop() -> None:
+    global _prefetch_worker
+    while True:
+        with _PREFETCH_QUEUE:
+            if not _prefetch_pending:
+                # Idle workers exit; the next card starts a fresh one
+                if not _PREFETCH_QUEUE.wait(60) and not _prefetch_pending:
+                    _prefetch_worker = None
+                    return
+                continue
+            slugs = list(_prefetch_pending)[:200]
+            for s in slugs:
+                _prefetch_pending.pop(s, None)
+        try:
+            rating_prefetch(slugs)
+        except Exception as e:
+            try: LOG.log("rating.prefetch.error", error=str(e))
+            except Exception: pass
+
+def _rating_from_rows(base: str, headers: Dict[str, str], slug: str) -> Tuple[bool, Dict[str, Any]]:
+    # Fallback for servers without the rating-summary hook: average the rows client-side
     a = load_auth() or {}
     uid = (a.get("record") or {}).get("id")
     tid = _ensure_term_record(slug, None)
@@ -794,16 +1136,7 @@ def rating_get(slug: str) -> Tuple[bool, Dict[str, Any]]:
                     mine = None
         except Exception:
             pass
-    res = {"avg": avg, "count": len(stars), "mine": mine, "termId": tid, "ratingId": rid}
-    try:
-        LOG.log("rating.get", id=slug, avg=avg, count=len(stars), mine=mine)
-    except Exception:
-        pass
-    try:
-        _RATING_CACHE[slug] = {"ts": time.time(), "data": res}
-    except Exception:
-        pass
-    return True, res
+    return True, {"avg": avg, "count": len(stars), "mine": mine, "termId": tid, "ratingId": rid}
 
 def rating_set(slug: str, stars: int) -> Tuple[bool, Dict[str, Any]]:
     base, headers = _base_headers()
@@ -814,8 +1147,8 @@ def rating_set(slug: str, stars: int) -> Tuple[bool, Dict[str, Any]]:
     # Try to derive a friendly title from the local store
     title = None
     try:
-        from .__init__ import GLOSSARY  # type: ignore
-        t = (getattr(GLOSSARY, 'terms_by_id', {}) or {}).get(slug) or {}
+        from . import GLOSSARY  # type: ignore
+        t = (getattr(GLOSSARY, 'term_meta', {}) or {}).get(slug) or {}
         names = t.get('names') or []
         if names:
             title = names[0]
@@ -844,9 +1177,11 @@ def rating_set(slug: str, stars: int) -> Tuple[bool, Dict[str, Any]]:
         url = f"{base.rstrip('/')}/api/collections/term_ratings/records"
         _req(url, method="POST", body=body, headers=headers)
     # Return updated snapshot
-    # Invalidate cached snapshot first
+    # Invalidate cached snapshot first; the generation bump keeps fetches that
+    # started before this rating from caching their older summary
     try:
-        if slug in _RATING_CACHE:
+        with _PREFETCH_LOCK:
+            _RATING_GEN[slug] = _RATING_GEN.get(slug, 0) + 1
             _RATING_CACHE.pop(slug, None)
     except Exception:
         pass
@@ -864,7 +1199,7 @@ def credits_get(slug: str) -> Tuple[bool, Dict[str, Any]]:
     current design where credits live inside the term JSON itself.
     """
     try:
-        from .__init__ import GLOSSARY  # type: ignore
+        from . import GLOSSARY  # type: ignore
         t = (getattr(GLOSSARY, 'terms_by_id', {}) or {}).get(slug) or {}
         creds = t.get('credits') or []
         out = []
@@ -937,7 +1272,7 @@ def comments_get(slug: str) -> Tuple[bool, Dict[str, Any]]:
     base, headers = _base_headers()
     if not base:
         try:
-            from .__init__ import get_config
+            from . import get_config
             base = (get_config() or {}).get("pb_base_url")
         except Exception:
             base = None
@@ -1021,8 +1356,8 @@ def comment_add(slug: str, body: str, parent_id: Optional[str] = None) -> Tuple[
     # Derive human title for term creation if needed
     title = None
     try:
-        from .__init__ import GLOSSARY  # type: ignore
-        t = (getattr(GLOSSARY, 'terms_by_id', {}) or {}).get(slug) or {}
+        from . import GLOSSARY  # type: ignore
+        t = (getattr(GLOSSARY, 'term_meta', {}) or {}).get(slug) or {}
         names = t.get('names') or []
         if names:
             title = names[0]
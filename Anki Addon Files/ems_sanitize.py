@@ -0,0 +1,109 @@
+from __future__ import annotations
+import html, re
+from functools import lru_cache
+from typing import List
+
+# One-pass allowlist sanitizer for popup HTML. The input is scanned once by a
+# single tokenizer: tags outside ALLOWED_TAGS are dropped (their text is kept),
+# attributes outside ALLOWED_ATTRS are dropped, and whatever is kept is copied
+# through byte for byte, so markup that is already clean comes out unchanged.
+#
+# Runs of text and plainly safe tags are consumed by the regex itself; only
+# tokens that might need rewriting reach Python. No tag pattern may cross a
+# '<', which keeps every scan linear; a raw '<' inside an attribute value
+# makes the tag fall back to escaped text.
+
+ALLOWED_TAGS = frozenset("""
+a abbr b blockquote br button caption code col colgroup dd del details div dl dt em
+figcaption figure h1 h2 h3 h4 h5 h6 hr i img ins kbd li mark ol p pre q s small span
+strong sub summary sup table tbody td tfoot th thead tr u ul
+""".split())
+
+ALLOWED_ATTRS = frozenset("""
+alt class colspan dir disabled height href lang open rel role rowspan scope span src
+start style target title type width
+""".split())
+
+# Whole elements removed together with their content
+_DROP_BLOCKS = "script|style|iframe|object|embed|template|noscript"
+
+def _alt(words) -> str:
+    return "|".join(sorted(words, key=len, reverse=True))
+
+_VALUE = r"""(?:"[^"<]*"|'[^'<]*'|[^\s"'=<>`]+)"""
+_SAFE_URL = r"""(?:"(?:\#|/|https?:|mailto:)[^"<]*"|'(?:\#|/|https?:|mailto:)[^'<]*')"""
+_SAFE_ATTR = (r"\s+(?:(?:" + _alt(ALLOWED_ATTRS - {"href", "src"}) + r"|data-[\w\-]*|aria-[\w\-]*)(?:\s*=\s*" + _VALUE + r")?"
+              r"|(?:href|src)\s*=\s*" + _SAFE_URL + r")")
+_SAFE_TAG = r"<(?:/(?:" + _alt(ALLOWED_TAGS) + r")\s*|(?:" + _alt(ALLOWED_TAGS) + r")(?:" + _SAFE_ATTR + r")*\s*/?)>"
+
+_TOKEN_RX = re.compile(
+    r"(?P<safe>(?:[^<\[]+|" + _SAFE_TAG + r"|\[(?!\[))+)"                     # text and clean tags, kept as is
+    r"|<!--.*?(?:-->|\Z)"                                                     # comment
+    r"|<\s*(?P<block>" + _DROP_BLOCKS + r")\b[^>]*>.*?(?:<\s*/\s*(?P=block)\s*>|\Z)"  # dangerous block
+    r"|<[!?][^>]*>"                                                           # doctype, CDATA, PI
+    r"|(?P<tag><\s*/?\s*[a-zA-Z][a-zA-Z0-9]*(?:[^<>\"']|\"[^\"<]*\"|'[^'<]*')*>)"  # any other tag
+    r"|\[\[(?P<link>[a-z0-9\-]+)\]\]"                                         # [[term-id]] link
+    r"|(?P<lt><)",                                                            # stray '<'
+    re.S | re.I)
+
+_TAG_RX = re.compile(r"<\s*(/?)\s*([a-zA-Z][a-zA-Z0-9]*)((?:[^<>\"']|\"[^\"<]*\"|'[^'<]*')*)>", re.S)
+_ATTR_RX = re.compile(r"""\s*([^\s"'>/=]+)(?:\s*=\s*(?:"([^"<]*)"|'([^'<]*)'|([^\s"'=<>`]+)))?""")
+
+_BAD_SCHEME_RX = re.compile(r"^(?:javascript|vbscript|livescript):", re.I)
+_CTRL_RX = re.compile(r"[\x00-\x20\x7f]+")
+
+
+def _unsafe_url(value: str) -> bool:
+    return bool(_BAD_SCHEME_RX.match(_CTRL_RX.sub("", html.unescape(value or ""))))
+
+
+def _clean_attrs(attrs: str) -> str:
+    out: List[str] = []; pos = 0
+    for m in _ATTR_RX.finditer(attrs):
+        if m.start() > pos:
+            out.append(attrs[pos:m.start()])
+        pos = m.end()
+        name = m.group(1).lower()
+        if not (name in ALLOWED_ATTRS or name.startswith("data-") or name.startswith("aria-")):
+            continue
+        if name in ("href", "src"):
+            value = next((g for g in m.group(2, 3, 4) if g is not None), "")
+            if _unsafe_url(value):
+                if name == "src": continue
+                q = "'" if m.group(3) is not None else '"'
+                lead = m.group(0)[:m.start(1) - m.start()]
+                out.append(f"{lead}href={q}#{q}"); continue
+        out.append(m.group(0))
+    out.append(attrs[pos:])
+    return "".join(out)
+
+
+@lru_cache(maxsize=4096)
+def _clean_tag(tok: str) -> str:
+    m = _TAG_RX.match(tok)
+    if not m or m.group(2).lower() not in ALLOWED_TAGS:
+        return ""
+    if m.group(1):
+        return tok
+    attrs = m.group(3)
+    clean = _clean_attrs(attrs)
+    return tok if clean == attrs else tok[:m.start(3)] + clean + ">"
+
+
+def _replace(m: "re.Match[str]") -> str:
+    kind = m.lastgroup
+    if kind == "safe":
+        return m.group(0)
+    if kind == "tag":
+        return _clean_tag(m.group(0))
+    if kind == "link":
+        link = m.group("link")
+        return f"<a href='#' data-ems-link='{link}'>{link}</a>"
+    if kind == "lt":
+        return "&lt;"
+    return ""
+
+
+def sanitize_html(value: str) -> str:
+    """Return `value` with disallowed markup removed and [[id]] links expanded."""
+    return _TOKEN_RX.sub(_replace, value or "")
@@ -244,4 +244,107 @@ try {
   });
 } catch (e) { console.log('ensure-term route failed', e && e.message ? e.message : String(e)); }
 
+// Rating summary for one term (avg, count and the caller's own rating) in one query,
+// so clients don't page through term_ratings rows to average them
+try {
+  routerAdd('GET', '/ems/rating-summary', (e) => {
+    try {
+      const info = e.requestInfo();
+      const a = info && info.auth;
+      const slug = String(e.request.url.query().get('slug') || '').trim().toLowerCase();
+      if (!slug) return e.json(400, { ok:false, error:'missing slug' });
+      let term = null;
+      try { term = $app.findFirstRecordByFilter('terms', 'slug={:s}', dbx.Params({ s: slug })); } catch(_) { term = null }
+      if (!term) return e.json(200, { ok:true, termId:null, avg:0, count:0, mine:null, ratingId:null });
+      const row = new DynamicModel({ avg: -0, count: 0 });
+      $app.db()
+        .newQuery("SELECT COALESCE(AVG(CAST(TRIM(stars) AS INTEGER)), 0) AS avg, COUNT(*) AS count FROM term_ratings WHERE term = {:t} AND CAST(TRIM(stars) AS INTEGER) BETWEEN 1 AND 5")
+        .bind(dbx.Params({ t: term.id }))
+        .one(row);
+      let mine = null, ratingId = null;
+      if (a) {
+        try {
+          const r = $app.findFirstRecordByFilter('term_ratings', 'term={:t} && user={:u}', dbx.Params({ t: term.id, u: a.id }));
+          ratingId = r.id;
+          mine = parseInt(String(r.get('stars') || '0'), 10) || null;
+        } catch(_) { mine = null; ratingId = null }
+      }
+      return e.json(200, { ok:true, termId: term.id, avg: row.avg, count: row.count, mine, ratingId });
+    } catch (err) {
+      return e.json(500, { ok:false, error: (err && err.message) ? err.message : String(err) });
+    }
+  });
+} catch (e) { console.log('rating-summary route failed', e && e.message ? e.message : String(e)); }
+
+// Rating summaries for many terms at once (used to prefetch every term on a card)
+try {
+  routerAdd('POST', '/ems/rating-summaries', (e) => {
+    try {
+      const info = e.requestInfo();
+      const a = info && info.auth;
+      const b = (info && info.body) || {};
+      const slugs = (Array.isArray(b.slugs) ? b.slugs : []).map(s => String(s || '').trim().toLowerCase()).filter(Boolean).slice(0, 200);
+      const items = {};
+      for (const s of slugs) items[s] = { termId:null, avg:0, count:0, mine:null, ratingId:null };
+      if (!slugs.length) return e.json(200, { ok:true, items });
+      const params = {};
+      const marks = slugs.map((s, i) => { params['s' + i] = s; return '{:s' + i + '}'; }).join(',');
+      const rows = arrayOf(new DynamicModel({ slug: '', termId: '', avg: -0, count: 0 }));
+      $app.db()
+        .newQuery("SELECT t.slug AS slug, t.id AS termId, COALESCE(AVG(CAST(TRIM(r.stars) AS INTEGER)), 0) AS avg, COUNT(r.id) AS count " +
+                  "FROM terms t LEFT JOIN term_ratings r ON r.term = t.id AND CAST(TRIM(r.stars) AS INTEGER) BETWEEN 1 AND 5 " +
+                  "WHERE t.slug IN (" + marks + ") GROUP BY t.id")
+        .bind(dbx.Params(params))
+        .all(rows);
+      const bySlugTerm = {};
+      for (const r of rows) {
+        items[r.slug] = { termId: r.termId, avg: r.avg, count: r.count, mine:null, ratingId:null };
+        bySlugTerm[r.termId] = r.slug;
+      }
+      const termIds = Object.keys(bySlugTerm);
+      if (a && termIds.length) {
+        const p2 = { u: a.id };
+        const marks2 = termIds.map((t, i) => { p2['t' + i] = t; return '{:t' + i + '}'; }).join(',');
+        const mine = arrayOf(new DynamicModel({ id: '', term: '', stars: '' }));
+        $app.db()
+          .newQuery("SELECT id, term, stars FROM term_ratings WHERE user = {:u} AND term IN (" + marks2 + ")")
+          .bind(dbx.Params(p2))
+          .all(mine);
+        for (const m of mine) {
+          const it = items[bySlugTerm[m.term]];
+          if (!it) continue;
+          it.ratingId = m.id;
+          it.mine = parseInt(String(m.stars || '0'), 10) || null;
+        }
+      }
+      return e.json(200, { ok:true, items });
+    } catch (err) {
+      return e.json(500, { ok:false, error: (err && err.message) ? err.message : String(err) });
+    }
+  });
+} catch (e) { console.log('rating-summaries route failed', e && e.message ? e.message : String(e)); }
+
+// Tamagotchi writes are ordered by a server-assigned revision in data.rev:
+// a PATCH carries the rev the client last saw and is refused with 409 when the
+// stored state has moved past it (e.g. written from another device). Checked
+// and bumped inside the save transaction so concurrent writes cannot interleave.
+try {
+  onRecordUpdateRequest((e) => {
+    const readData = (r) => { try { return JSON.parse(toString(r.get('data')) || '{}') || {}; } catch(_) { return {}; } };
+    e.app.runInTransaction((txApp) => {
+      let cur = null;
+      try { cur = txApp.findRecordById('tamagotchi', e.record.id); } catch(_) { cur = null }
+      const have = parseInt(String((cur ? readData(cur) : {}).rev || 0), 10) || 0;
+      const next = readData(e.record);
+      if ((parseInt(String(next.rev || 0), 10) || 0) < have) {
+        throw new ApiError(409, 'stale tamagotchi state', { rev: have });
+      }
+      next.rev = have + 1;
+      e.record.set('data', next);
+      e.app = txApp;
+      e.next();
+    });
+  }, 'tamagotchi');
+} catch (e) { console.log('tamagotchi rev hook failed', e && e.message ? e.message : String(e)); }
+
 // Credits-related PocketBase features removed; credits now come only from term JSON
@@ -3,6 +3,9 @@
   const SHARED = window._EMS_SHARED || (window._EMS_SHARED = {
     bound: false,
     index: null,
+    fullIndex: null,        // {version, idx} fetched once per webview
+    indexVersion: "",
+    setupToken: 0,          // cancels stale async setups
     openToken: 0,           // cancels stale loads
     pendingHoverEl: null,   // hover intent target
     anchorEl: null
@@ -44,14 +47,7 @@
       }
     }
 
-    const titleLookup = Object.create(null);
-    for (const id in meta){
-      const title=(meta[id] && (meta[id].title||"")).toLowerCase().replace(/\s+/g," ").trim();
-      if (title){
-        if (!titleLookup[title]) titleLookup[title] = [id];
-        else if (!titleLookup[title].includes(id)) titleLookup[title].push(id);
-      }
-    }
+    const titleLookup = buildTitleLookup(meta);
 
     const alts = Object.keys(mapCandidates).sort((a,b)=>b.length-a.length);
     const esc  = s => s.replace(/[.*+?^${}()|[\]\\]/g,"\\$&")
@@ -68,6 +64,103 @@
     return { mapCandidates, mapClaims: claims, rx, meta, titleLookup };
   }
 
+  function buildTitleLookup(meta){
+    const titleLookup = Object.create(null);
+    for (const id in meta){
+      const title=(meta[id] && (meta[id].title||"")).toLowerCase().replace(/\s+/g," ").trim();
+      if (title){
+        if (!titleLookup[title]) titleLookup[title] = [id];
+        else if (!titleLookup[title].includes(id)) titleLookup[title].push(id);
+      }
+    }
+    return titleLookup;
+  }
+
+  // v2 card payloads list the surfaces Python already found ([surface, ids],
+  // longest first); matching them is a literal search, no regex to compile.
+  function buildSurfaceIndex(payload){
+    const meta = payload.meta || {};
+    const mapCandidates = Object.create(null);
+    const surfaces = [];
+    for (const pair of (payload.surfaces||[])) {
+      const k = String((pair && pair[0]) || "").toLowerCase();
+      const ids = (pair && pair[1]) || [];
+      if (!k || !ids.length || mapCandidates[k]) continue;
+      mapCandidates[k] = ids.slice(); surfaces.push(k);
+    }
+    surfaces.sort((a,b)=>b.length-a.length);
+    try{ emsLog('DEBUG','index.built',{terms:(payload.terms||[]).length, surfaces:surfaces.length}); }catch(_){ }
+    return { mapCandidates, mapClaims: mapCandidates, surfaces, meta, titleLookup: buildTitleLookup(meta) };
+  }
+
+  const isWordCode = c => (c >= 48 && c <= 57) || (c >= 65 && c <= 90) || (c >= 97 && c <= 122);
+
+  // Leftmost-longest, non-overlapping [start, end) spans of the surfaces in
+  // text, with the same A-Za-z0-9 word boundaries as the regex path.
+  // Lowercase `text`, recording for each code unit of the result the span of
+  // `text` it came from; only needed when lowercasing changes the length ('İ').
+  function lowerWithMap(text){
+    let low = "";
+    const from = [], to = [];
+    let k = 0;
+    for (const ch of text) {
+      const l = ch.toLowerCase();
+      for (let n = 0; n < l.length; n++) { from.push(k); to.push(k + ch.length); }
+      low += l; k += ch.length;
+    }
+    return { low, from, to };
+  }
+
+  function findSurfaces(text, surfaces){
+    let low = text.toLowerCase(), map = null;
+    if (low.length !== text.length) { map = lowerWithMap(text); low = map.low; }
+    const hits = [];
+    for (const s of surfaces) {
+      for (let i = low.indexOf(s); i !== -1; i = low.indexOf(s, i + 1)) {
+        const j = i + s.length;
+        if (i > 0 && isWordCode(low.charCodeAt(i - 1))) continue;
+        if (j < low.length && isWordCode(low.charCodeAt(j))) continue;
+        hits.push(map ? [map.from[i], map.to[j - 1]] : [i, j]);
+      }
+    }
+    if (hits.length < 2) return hits;
+    hits.sort((a,b)=>(a[0]-b[0]) || (b[1]-a[1]));
+    const out = []; let end = 0;
+    for (const h of hits) if (h[0] >= end) { out.push(h); end = h[1]; }
+    return out;
+  }
+
+  function matchSpans(idx, text){
+    if (idx.surfaces) return findSurfaces(text, idx.surfaces);
+    const out = [];
+    idx.rx.lastIndex = 0;
+    for (let m; (m = idx.rx.exec(text)); ) out.push([m.index, m.index + m[0].length]);
+    return out;
+  }
+
+  // The full term index is large; fetch it over the bridge once per webview and
+  // reuse it until Python reports a different version.
+  function loadFullIndex(done){
+    const c = SHARED.fullIndex;
+    if (c && (!SHARED.indexVersion || c.version === SHARED.indexVersion)) { done(c.idx); return; }
+    if (!window.pycmd) { done(c ? c.idx : null); return; }
+    const waiters = SHARED.fullIndexWaiters || (SHARED.fullIndexWaiters = []);
+    waiters.push(done);
+    if (waiters.length > 1) return;  // already in flight
+    pycmd("ems_glossary:index", ret => {
+      const cbs = waiters.splice(0);
+      let idx = c ? c.idx : null;
+      try {
+        if (ret && ret.terms && ret.terms.length) {
+          idx = buildIndex(ret);
+          SHARED.fullIndex = { version: String(ret.version || ""), idx };
+          if (ret.live) SHARED.live = ret.live;
+        }
+      } catch(e) { console.error("EMS Glossary index load failed:", e); }
+      cbs.forEach(cb => { try { cb(idx); } catch(e) { console.error(e); } });
+    });
+  }
+
   function wrapMatches(idx){
     const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT, {
       acceptNode(node){
@@ -85,21 +178,21 @@
 
     while (walker.nextNode()) {
       const node = walker.currentNode;
-      if (!idx.rx.test(node.nodeValue)) continue;
-      idx.rx.lastIndex = 0;
-
       const text = node.nodeValue;
+      const spans = matchSpans(idx, text);
+      if (!spans.length) continue;
+
       let last = 0;
       const frag = document.createDocumentFragment();
       let changed = false;
 
-      for (let m; (m = idx.rx.exec(text)); ) {
-        const word = m[0];
+      for (const [start, end] of spans) {
+        const word = text.slice(start, end);
         const key = word.toLowerCase();
         const ids = idx.mapCandidates[key] || [];
         if (!ids.length) continue;
 
-        if (m.index > last) frag.appendChild(document.createTextNode(text.slice(last, m.index)));
+        if (start > last) frag.appendChild(document.createTextNode(text.slice(last, start)));
 
         const span = document.createElement("span");
         span.className = "ems-term";
@@ -112,7 +205,7 @@
         if (meta0.accent) span.style.setProperty("--ems-accent", meta0.accent);
 
         frag.appendChild(span);
-        last = idx.rx.lastIndex;
+        last = end;
         changed = true;
       }
 
@@ -479,16 +572,33 @@
   }
 
   /* =================== unified open path with tokens ==================== */
+  // Python acks "get" with {pending:true}, builds the payload on a worker and
+  // pushes it through EMSGlossary.deliverTerm. One request per term is in
+  // flight at a time; everyone waiting on that term gets the same result.
+  function settleTerm(termId, ret){
+    const pending = SHARED.pendingTerms || {};
+    const cbs = pending[termId] || [];
+    delete pending[termId];
+    cbs.forEach(f => { try { f(ret || {}); } catch(e) { console.error(e); } });
+  }
+
   function fetchTerm(termId, done){
-    // Robust fetch with one retry and a final timeout that paints an error UI
     if (!window.pycmd){ done({html:"<div class='ems-small'>No bridge.</div>"}); return; }
+    const pending = SHARED.pendingTerms || (SHARED.pendingTerms = Object.create(null));
     let answered = false;
     const cb = (ret)=>{ if (answered) return; answered = true; done(ret||{}); };
-    try { pycmd(`ems_glossary:get:${termId}`, cb); } catch(e) {}
-    // Retry once shortly after
-    setTimeout(()=>{ if (!answered) { try { pycmd(`ems_glossary:get:${termId}`, cb); } catch(e) {} } }, 350);
-    // Hard timeout → surface a retry affordance
-    setTimeout(()=>{ if (!answered) { cb({html: `<div class='ems-small'>Timed out. <a href='#' data-ems-retry='${escHtml(termId)}'>Retry</a></div>`}); } }, 1500);
+    const waiting = pending[termId] || (pending[termId] = []);
+    waiting.push(cb);
+    if (waiting.length === 1) {
+      try { pycmd(`ems_glossary:get:${termId}`, ret => { if (!(ret && ret.pending)) settleTerm(termId, ret); }); } catch(e) {}
+    }
+    // Hard timeout → surface a retry affordance (and let a retry send again)
+    setTimeout(()=>{
+      if (answered) return;
+      const w = pending[termId];
+      if (w) { const i = w.indexOf(cb); if (i >= 0) w.splice(i, 1); if (!w.length) delete pending[termId]; }
+      cb({html: `<div class='ems-small'>Timed out. <a href='#' data-ems-retry='${escHtml(termId)}'>Retry</a></div>`});
+    }, 4000);
   }
 
   function openTermNear(target, termId){
@@ -624,12 +734,14 @@ d.innerHTML="<header>Glossary <span class='tag'>G to toggle</span></header><div
     return d;
   }
 
+  function drawerIndex(){ return (SHARED.fullIndex && SHARED.fullIndex.idx) || SHARED.index || index; }
+
   function populateDrawer(idx){
     const d=ensureDrawer();
     const list=d.querySelector(".ems-list");
     list.innerHTML="";
 
-    idx = idx || SHARED.index;
+    idx = idx || drawerIndex();
     if (!idx){
       list.innerHTML = "<div style='padding:12px;opacity:.8'>No terms loaded yet.</div>";
       return;
@@ -642,6 +754,7 @@ d.innerHTML="<header>Glossary <span class='tag'>G to toggle</span></header><div
     const allTags=new Set();
     for (const id in idx.meta) for (const t of (idx.meta[id].tags||[])) allTags.add(t);
 
+    if (d._emsIdx !== idx) { d._emsIdx = idx; tagMenu.dataset.built = ""; }
     if (!tagMenu.dataset.built) {
       tagMenu.innerHTML=`<div class="opt" data-tag="">All tags</div>` +
         Array.from(allTags).sort().map(t=>`<div class="opt" data-tag="${t}">${t}</div>`).join("");
@@ -680,11 +793,13 @@ d.innerHTML="<header>Glossary <span class='tag'>G to toggle</span></header><div
     const d=ensureDrawer();
     if (show===false){ d.classList.remove("is-open"); emsLog('DEBUG','drawer.hide',{}); return; }
     if (d.classList.contains("is-open")) { d.classList.remove("is-open"); emsLog('DEBUG','drawer.hide',{}); return; }
-    populateDrawer(SHARED.index || index);
+    populateDrawer(drawerIndex());
     d.classList.add("is-open");
     emsLog('DEBUG','drawer.open',{});
     const inp = d.querySelector(".toolbar input");
-    if (inp) inp.oninput = () => populateDrawer(SHARED.index || index);
+    if (inp) inp.oninput = () => populateDrawer(drawerIndex());
+    // Search the whole glossary, not just this card's terms
+    loadFullIndex(idx => { if (idx && d.classList.contains("is-open")) populateDrawer(idx); });
   }
 
   /* ============================ global binds ============================ */
@@ -742,7 +857,7 @@ d.innerHTML="<header>Glossary <span class='tag'>G to toggle</span></header><div
 
     // G — only consume if an index exists (prevents a 2nd copy from eating the key)
     if ((ev.key==="g"||ev.key==="G") && !ev.metaKey && !ev.ctrlKey && !ev.altKey) {
-      const haveIndex = !!(SHARED.index || index);
+      const haveIndex = !!drawerIndex();
       if (!haveIndex) return;
       ev.preventDefault(); ev.stopPropagation();
       toggleDrawer(true);
@@ -764,20 +879,46 @@ d.innerHTML="<header>Glossary <span class='tag'>G to toggle</span></header><div
   }
 
   /* ================================= setup ============================== */
+  function apply(idx){
+    index = idx;
+    SHARED.index = index; // share for hotkey and other copies
+    wrapMatches(index);
+    stitchMultiWord(index);
+    bindOnce();
+  }
+
   function setup(payload){
     try{
-      if (!payload || !payload.terms || !payload.terms.length) return;
+      if (!payload) return;
+      const token = ++SHARED.setupToken;
+      if (payload.indexVersion) SHARED.indexVersion = String(payload.indexVersion);
+      if (payload.useIndex) {
+        // No matches on this card: highlight against the cached full index
+        loadFullIndex(idx => {
+          if (!idx || token !== SHARED.setupToken) return;  // a newer card took over
+          try { apply(idx); } catch(e) { console.error("EMS Glossary setup failed:", e); }
+        });
+        return;
+      }
+      if (!payload.terms || !payload.terms.length) return;
       // Capture live flags (offline, loggedIn) for UI decisions
       try { SHARED.live = (payload && payload.live) ? payload.live : {}; } catch(e) { SHARED.live = {}; }
-      index = buildIndex(payload);
-      SHARED.index = index; // share for hotkey and other copies
-      wrapMatches(index);
-      stitchMultiWord(index);
-      bindOnce();
+      apply((payload.v >= 2 && payload.surfaces) ? buildSurfaceIndex(payload) : buildIndex(payload));
     } catch(e) { console.error("EMS Glossary setup failed:", e); }
   }
 
   window.EMSGlossary = { setup, __bound: true };
+  window.EMSGlossary.deliverTerm = function(tid, payload){ settleTerm(String(tid), payload); };
+  // Python pushes connectivity changes here, so an open popup needs no refetch
+  window.EMSGlossary.setLive = function(live){
+    SHARED.live = live || {};
+    try {
+      document.querySelectorAll('.ems-body[data-live-offline]').forEach(b => {
+        b.setAttribute('data-live-loggedin', (SHARED.live.loggedIn ? '1' : '0'));
+        b.setAttribute('data-live-offline', (SHARED.live.offline ? '1' : '0'));
+      });
+    } catch(e) {}
+  };
   // Allow Python to asynchronously push rating updates without blocking UI
   window.EMSGlossary.updateRating = function(tid, avg, count, mine){
     try{
@@ -0,0 +1,78 @@
+import html, json, re, sys, timeit
+from pathlib import Path
+
+# Benchmarks the add-on's one-pass HTML sanitizer against the regex chain it
+# replaced, on popup-like HTML built from the largest glossary terms, and
+# checks that both produce the same output for clean markup.
+#
+#   python scripts/bench_sanitize.py        # 10 largest terms
+#   python scripts/bench_sanitize.py 25     # 25 largest terms
+
+ROOT = Path(__file__).resolve().parents[1]
+TERMS = ROOT / "glossary" / "terms"
+sys.path.insert(0, str(ROOT / "Anki Addon Files"))
+from ems_sanitize import sanitize_html  # noqa: E402  (no aqt needed)
+
+_on_attr_rx  = re.compile(r'\son[a-zA-Z]+\s*=\s*"[^"]*"', re.IGNORECASE)
+_on_attr_rx2 = re.compile(r"\son[a-zA-Z]+\s*=\s*'[^']*'", re.IGNORECASE)
+_js_href_rx  = re.compile(r'href\s*=\s*"(?:\s*javascript:.*?)"', re.IGNORECASE)
+_js_href_rx2 = re.compile(r"href\s*=\s*'(?:\s*javascript:.*?)'", re.IGNORECASE)
+_script_block_rx = re.compile(r"(?is)<\s*script[^>]*>.*?<\s*/\s*script\s*>", re.S)
+
+def regex_chain(value):
+    s = value or ""
+    s = _script_block_rx.sub("", s)
+    s = _on_attr_rx.sub("", s)
+    s = _on_attr_rx2.sub("", s)
+    s = _js_href_rx.sub('href="#"', s)
+    s = _js_href_rx2.sub("href='#'", s)
+    s = re.sub(r"\[\[([a-z0-9\-]+)\]\]", r"<a href='#' data-ems-link='\1'>\1</a>", s, flags=re.IGNORECASE)
+    return s
+
+def popup_like_html(t):
+    """Rough stand-in for the add-on's popup renderer: same tags and attribute style."""
+    parts = ["<div class='ems-body'><div class='ems-content'>",
+             f"<div class='ems-ratingbar' data-ems-tid='{html.escape(t.get('id', ''))}'>"
+             + "".join(f"<button type='button' class='ems-star' data-star='{i}' aria-label='{i} star'>&#9733;</button>" for i in range(1, 6))
+             + "</div>",
+             f"<h3>{html.escape((t.get('names') or ['?'])[0])}</h3>"]
+    for key, val in t.items():
+        if isinstance(val, str):
+            body = f"<p>{html.escape(val)}</p>"
+        elif isinstance(val, list):
+            body = "<ul>" + "".join(f"<li>{html.escape(v if isinstance(v, str) else json.dumps(v, ensure_ascii=False))}</li>" for v in val) + "</ul>"
+        else:
+            continue
+        parts.append(f"<details open class='ems-section' data-sec='{key}'><summary>{key}<button class='ems-learn' title='Add this as a card'>+ Learn</button></summary>{body}</details>")
+    for sid in t.get("see_also") or []:
+        parts.append(f"<a href='#' data-ems-link='{sid}'>[{sid}]</a> [[{sid}]]")
+    parts.append("<img class='ems-logo' src='/_addons/ems/web/ems_logo.png' alt='EMS'/></div></div>")
+    return "".join(parts)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    files = sorted(TERMS.glob("*.json"), key=lambda p: p.stat().st_size, reverse=True)
+    docs = []
+    for p in files:
+        try:
+            docs.append((p.name, popup_like_html(json.loads(p.read_text(encoding="utf-8")))))
+        except Exception:
+            continue
+        if len(docs) >= n: break
+    if not docs:
+        print("❌ No term files found."); sys.exit(1)
+
+    mismatches = [name for name, doc in docs if sanitize_html(doc) != regex_chain(doc)]
+    total_kb = sum(len(d) for _n, d in docs) / 1024
+    print(f"{len(docs)} terms, {total_kb:.1f} KiB of HTML")
+    for label, fn in (("regex chain", regex_chain), ("one pass", sanitize_html)):
+        runs = timeit.repeat(lambda: [fn(d) for _n, d in docs], number=20, repeat=5)
+        per_doc = min(runs) / 20 / len(docs) * 1e6
+        print(f"  {label:12s} {per_doc:8.1f} µs/term")
+    if mismatches:
+        print("⚠️  Output differs on clean markup for:\n- " + "\n- ".join(mismatches))
+        sys.exit(1)
+    print("✅ Identical output on clean markup.")
+
+if __name__ == "__main__":
+    main()
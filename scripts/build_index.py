@@ -0,0 +1,41 @@
+import hashlib, json, sys
+from pathlib import Path
+
+# Regenerates glossary/index.json with a content hash and size for every listed
+# term file. The add-on compares these against its last snapshot and downloads
+# only files whose sha1 changed.
+#
+#   python scripts/build_index.py              # refresh hashes, keep version
+#   python scripts/build_index.py 2025-09-18a  # refresh hashes, set version
+
+ROOT = Path(__file__).resolve().parents[1]
+GDIR = ROOT / "glossary"
+TERMS = GDIR / "terms"
+INDEX = GDIR / "index.json"
+
+index = json.loads(INDEX.read_text(encoding="utf-8"))
+files = index.get("files") or []
+if not isinstance(files, list) or not files:
+    print("❌ index.json must have a non-empty 'files' array.")
+    sys.exit(1)
+
+entries, missing = [], []
+for entry in files:
+    fn = entry if isinstance(entry, str) else (entry or {}).get("file")
+    if not fn:
+        continue
+    path = TERMS / fn
+    if not path.is_file():
+        # Keep it listed without a hash; the add-on then always fetches it.
+        missing.append(fn)
+        entries.append({"file": fn})
+        continue
+    data = path.read_bytes()
+    entries.append({"file": fn, "sha1": hashlib.sha1(data).hexdigest(), "size": len(data)})
+
+out = {"version": sys.argv[1] if len(sys.argv) > 1 else index.get("version", "?"), "files": entries}
+INDEX.write_text(json.dumps(out, ensure_ascii=False, indent=4) + "\n", encoding="utf-8")
+
+if missing:
+    print("⚠️  Listed but not found (no hash written):\n- " + "\n- ".join(missing))
+print(f"✅ Wrote {INDEX.relative_to(ROOT)}: {len(entries)} files, version {out['version']}.")
@@ -1,4 +1,4 @@
-import json, os, re, sys
+import hashlib, json, os, re, sys
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
@@ -39,6 +39,9 @@ for entry in files:
     if not path.exists():
         errors.append(f"Listed in index but missing on disk: {fn}")
         continue
+    if isinstance(entry, dict) and entry.get("sha1"):
+        if hashlib.sha1(path.read_bytes()).hexdigest() != entry["sha1"]:
+            errors.append(f"{fn}: sha1 in index.json is stale (run scripts/build_index.py)")
     obj = load_json(path)
     if obj is None:
         continue